@@ -0,0 +1,214 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from asgiref.sync import sync_to_async
+from recipes import versions
+from recipes.membership import get_membership
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+from .caching import rendered_cache, response_cache_stats
+from .views import (ReadOnlyIngredientViewSet, ReadOnlyTagViewSet,
+                    RecipeViewSet, SubscriptionsListView)
+
+
+def async_read(handler, sync_view):
+    '''
+    Обслуживает GET асинхронным handler, остальные методы — sync_view.
+
+    Если handler вернул None (ошибка, браузерный API, редкий вариант
+    запроса), запрос целиком передаётся синхронному представлению.
+    '''
+    async def view(request, *args, **kwargs):
+        if (
+            request.method == 'GET'
+            and 'text/html' not in request.headers.get('Accept', '')
+        ):
+            response = await handler(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+def _call(func):
+    # Потоки пула живут дольше запроса: соединение закрывается после
+    # работы по правилам CONN_MAX_AGE, как в конце обычного запроса.
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def concurrently(*funcs):
+    '''
+    Выполняет независимые запросы одновременно: каждый в своём потоке
+    и, значит, на своём соединении с БД.
+    '''
+    return await asyncio.gather(*(
+        sync_to_async(_call, thread_sensitive=False)(func) for func in funcs
+    ))
+
+
+def initialize(view_class, request, action, **kwargs):
+    '''
+    Готовит экземпляр DRF-представления: аутентификация и права.
+    '''
+    view = view_class(action_map={'get': action})
+    view.args = ()
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    view.request = view.initialize_request(request, **kwargs)
+    try:
+        view.perform_authentication(view.request)
+        view.check_permissions(view.request)
+    except APIException:
+        return None
+    return view
+
+
+def render(data):
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json'
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def membership_loaders(membership):
+    return (
+        lambda: membership.favorite_ids,
+        lambda: membership.cart_ids,
+        lambda: membership.author_ids,
+    )
+
+
+async def anonymous_cached(view, request, handler):
+    '''
+    Асинхронный аналог AnonymousResponseCacheMixin с тем же ключом.
+    '''
+    if (
+        view.request.user.is_authenticated
+        or 'HTTP_AUTHORIZATION' in request.META
+        or not settings.RESPONSE_CACHE_TIMEOUT
+        or not view.is_response_cacheable(request)
+    ):
+        return await handler()
+    key = await sync_to_async(view.get_response_cache_key)(request)
+    cached = await cache.aget(key)
+    if cached is not None:
+        response_cache_stats.hit()
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+        return response
+    response_cache_stats.miss()
+    response = await handler()
+    if response is None or response.status_code != 200:
+        return response
+    await cache.aset(
+        key, (response.content, response['Content-Type']),
+        settings.RESPONSE_CACHE_TIMEOUT,
+    )
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def recipe_list(request):
+    view = await sync_to_async(initialize)(RecipeViewSet, request, 'list')
+    if view is None:
+        return None
+
+    async def handler():
+        try:
+            queryset = view.filter_queryset(view.get_queryset()).values(
+                'id', 'author_id'
+            )
+        except APIException:
+            return None
+        try:
+            page, *_ = await concurrently(
+                lambda: view.paginate_queryset(queryset),
+                *membership_loaders(get_membership(view.request)),
+            )
+        except APIException:
+            return None
+        if page is None:
+            return None
+        data = await sync_to_async(view.get_list_data)(page)
+        return render(view.get_paginated_response(data).data)
+
+    return await anonymous_cached(view, request, handler)
+
+
+async def recipe_detail(request, pk):
+    view = await sync_to_async(initialize)(
+        RecipeViewSet, request, 'retrieve', pk=pk
+    )
+    if view is None:
+        return None
+
+    async def handler():
+        recipe, *_ = await concurrently(
+            lambda: view.get_queryset().filter(pk=pk).first(),
+            *membership_loaders(get_membership(view.request)),
+        )
+        if recipe is None:
+            return None
+        return render(view.get_serializer(recipe).data)
+
+    return await anonymous_cached(view, request, handler)
+
+
+async def catalog_list(request, view_class):
+    view = await sync_to_async(initialize)(view_class, request, 'list')
+    if view is None:
+        return None
+    version = await sync_to_async(versions.get_version)(view.catalog)
+    etag = view.get_catalog_etag(request, version)
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if '*' in etags or etag in etags:
+        return view.patch_catalog_headers(HttpResponseNotModified(), etag)
+    cached = rendered_cache.get(etag)
+    if cached is None:
+        response = await sync_to_async(view.list)(view.request)
+        cached = (JSONRenderer().render(response.data), 'application/json')
+        rendered_cache.set(etag, cached)
+    content, content_type = cached
+    return view.patch_catalog_headers(
+        HttpResponse(content, content_type=content_type), etag
+    )
+
+
+async def ingredient_list(request):
+    return await catalog_list(request, ReadOnlyIngredientViewSet)
+
+
+async def tag_list(request):
+    return await catalog_list(request, ReadOnlyTagViewSet)
+
+
+async def subscription_list(request):
+    view = await sync_to_async(initialize)(
+        SubscriptionsListView, request, 'list'
+    )
+    if view is None:
+        return None
+    membership = get_membership(view.request)
+    page, _ = await concurrently(
+        lambda: view.paginate_queryset(view.get_queryset()),
+        lambda: membership.author_ids,
+    )
+    if page is None:
+        return None
+    data = view.get_serializer(page, many=True).data
+    return render(view.get_paginated_response(data).data)
@@ -0,0 +1,234 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, urlencode
+
+from recipes import versions
+
+
+class RenderedCache:
+    '''
+    Ограниченный LRU-кэш отрендеренных ответов в памяти процесса.
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+rendered_cache = RenderedCache(settings.CATALOG_CACHE_SIZE)
+
+
+class ResponseCacheStats:
+    '''
+    Счётчики попаданий и промахов кэша ответов в процессе.
+    '''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+class CatalogCacheMixin:
+    '''
+    Кэширует GET-ответы справочника по версии каталога.
+
+    Отдаёт ETag и Cache-Control, отвечает 304 на If-None-Match
+    и хранит отрендеренные байты в памяти процесса, не обращаясь к БД.
+    '''
+    catalog = None
+
+    def get_catalog_etag(self, request, version):
+        variant = hashlib.md5(
+            f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT")}'
+            .encode('utf-8')
+        ).hexdigest()
+        return f'"{self.catalog}-{version}-{variant}"'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+        etag = self.get_catalog_etag(
+            request, versions.get_version(self.catalog)
+        )
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                return self.patch_catalog_headers(
+                    HttpResponseNotModified(), etag
+                )
+        cached = rendered_cache.get(etag)
+        if cached is not None:
+            content, content_type = cached
+            return self.patch_catalog_headers(
+                HttpResponse(content, content_type=content_type), etag
+            )
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response.render()
+        rendered_cache.set(etag, (response.content, response['Content-Type']))
+        return self.patch_catalog_headers(response, etag)
+
+    def patch_catalog_headers(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    '''
+    Кэширует GET-ответы для анонимных пользователей.
+
+    Ключ строится из пути, нормализованных параметров запроса и версии
+    каталога рецептов, поэтому попадание в кэш не обращается к БД.
+    '''
+    response_cache_version = versions.RECIPES
+    # Порядок по популярности меняется с каждым добавлением в избранное,
+    # не меняя версию каталога, поэтому такие ответы не кэшируются.
+    response_cache_uncached_ordering = ('popularity',)
+
+    def is_response_cacheable(self, request):
+        return not any(
+            field.strip().lstrip('-') in self.response_cache_uncached_ordering
+            for value in request.GET.getlist('ordering')
+            for field in value.split(',')
+        )
+
+    def get_response_cache_key(self, request):
+        params = urlencode(sorted(
+            (key, sorted(values)) for key, values in request.GET.lists()
+        ), doseq=True)
+        variant = hashlib.md5(
+            f'{request.get_host()}|{request.path}|{params}|'
+            f'{request.META.get("HTTP_ACCEPT")}'.encode('utf-8')
+        ).hexdigest()
+        version = versions.get_version(self.response_cache_version)
+        return f'response:{self.response_cache_version}:{version}:{variant}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or not settings.RESPONSE_CACHE_TIMEOUT
+            or not self.is_response_cacheable(request)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            response_cache_stats.hit()
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+        response_cache_stats.miss()
+        response = super().dispatch(request, *args, **kwargs)
+        user = getattr(request, 'user', None)
+        if response.status_code == 200 and not (
+            user and user.is_authenticated
+        ):
+            response.render()
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class RecipeFragmentCache:
+    '''
+    Кэш не зависящей от пользователя части RecipeSerializer.
+
+    Ключ фрагмента включает версии рецепта, его автора, тегов
+    и ингредиентов, поэтому устаревшие фрагменты просто перестают
+    читаться. Изменение автора меняет одну версию — версию автора.
+    '''
+    shared_versions = (versions.TAGS, versions.INGREDIENTS)
+
+    def get_keys(self, rows):
+        found = versions.get_versions([
+            *self.shared_versions,
+            *(versions.recipe(row['id']) for row in rows),
+            *(versions.author(row['author_id']) for row in rows),
+        ])
+        shared = '.'.join(str(found[name]) for name in self.shared_versions)
+        return {
+            row['id']: (
+                f'recipe-fragment:{row["id"]}:'
+                f'{found[versions.recipe(row["id"])]}:'
+                f'{found[versions.author(row["author_id"])]}:{shared}'
+            )
+            for row in rows
+        }
+
+    def get_many(self, rows, render):
+        '''
+        Возвращает фрагменты рецептов rows (словари с id и author_id)
+        в том же порядке; недостающие рендерит через render(missing_ids)
+        и сохраняет.
+        '''
+        rows = list(rows)
+        recipe_ids = [row['id'] for row in rows]
+        keys = self.get_keys(rows)
+        found = cache.get_many(keys.values())
+        fragments = {
+            recipe_id: found[key]
+            for recipe_id, key in keys.items() if key in found
+        }
+        missing = [
+            recipe_id for recipe_id in recipe_ids
+            if recipe_id not in fragments
+        ]
+        if missing:
+            rendered = {item['id']: item for item in render(missing)}
+            cache.set_many(
+                {keys[pk]: item for pk, item in rendered.items()},
+                settings.RECIPE_FRAGMENT_TIMEOUT,
+            )
+            fragments.update(rendered)
+        return [
+            fragments[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in fragments
+        ]
+
+
+recipe_fragments = RecipeFragmentCache()
@@ -1,5 +1,7 @@
+from django.db.models import Exists, OuterRef
+
 from django_filters import rest_framework as filters
-from recipes.models import Recipe
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
 
 
 class MyFilterBackend(filters.DjangoFilterBackend):
@@ -12,6 +14,24 @@ class MyFilterBackend(filters.DjangoFilterBackend):
         return kwargs
 
 
+class StableOrderingFilter(filters.OrderingFilter):
+    '''
+    Добавляет id в конец сортировки в том же направлении, что и первое
+    поле: страницы стабильны при равных значениях, а порядок совпадает
+    с составными индексами вида (поле, id).
+    '''
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        ordering = list(qs.query.order_by)
+        if ordering and not any(
+            field.lstrip('-') in ('id', 'pk') for field in ordering
+        ):
+            direction = '-' if ordering[0].startswith('-') else ''
+            qs = qs.order_by(*ordering, f'{direction}id')
+        return qs
+
+
 class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart', label='Is in shopping cart'
@@ -25,6 +45,13 @@ class RecipeFilter(filters.FilterSet):
         field_name='tags',
     )
 
+    search = filters.CharFilter(method='filter_search', label='Search')
+
+    ordering = StableOrderingFilter(
+        fields=(('favorites_count', 'popularity'), ('id', 'id')),
+        label='Ordering',
+    )
+
     class Meta:
         model = Recipe
         fields = []
@@ -34,18 +61,27 @@ class RecipeFilter(filters.FilterSet):
         super().__init__(*args, **kwargs)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            if self.user.is_authenticated:
-                queryset = Recipe.objects.filter(shoppinglist__user=self.user)
+        if value and self.user.is_authenticated:
+            queryset = queryset.filter(Exists(ShoppingList.objects.filter(
+                user=self.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
-        if value:
-            if self.user.is_authenticated:
-                queryset = Recipe.objects.filter(
-                    favoriterecipe__user=self.user
-                )
+        if value and self.user.is_authenticated:
+            queryset = queryset.filter(Exists(FavoriteRecipe.objects.filter(
+                user=self.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def filter_by_tags_slug(self, queryset, name, value):
-        return queryset.filter(tags__slug=value)
+        # Фронтенд передаёт tags=... несколько раз; рецепт подходит,
+        # если у него есть хотя бы один из тегов. Exists не размножает
+        # строки, поэтому DISTINCT не нужен.
+        slugs = self.data.getlist(name)
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__slug__in=slugs
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
@@ -0,0 +1,190 @@
+import contextvars
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .caching import response_cache_stats
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    '''
+    Счётчики одного запроса. Контекст копируется в потоки
+    sync_to_async, поэтому запросы к БД из них тоже учитываются.
+    '''
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.in_serializer = False
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += duration
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(perf_counter() - started)
+
+
+def install_execute_wrapper(wrapper):
+    '''
+    Подключает wrapper ко всем соединениям с БД, включая будущие.
+    '''
+    def add(connection):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    def on_connection_created(sender, connection, **kwargs):
+        add(connection)
+
+    connection_created.connect(
+        on_connection_created,
+        weak=False,
+        dispatch_uid=f'{wrapper.__module__}.{wrapper.__qualname__}',
+    )
+    for connection in connections.all(initialized_only=True):
+        add(connection)
+
+
+class TimedSerializerMixin:
+    '''
+    Учитывает время сериализации верхнего уровня в метриках запроса.
+    '''
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.in_serializer:
+            return super().to_representation(instance)
+        metrics.in_serializer = True
+        started = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += perf_counter() - started
+            metrics.in_serializer = False
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [
+                    [0] * (len(self.buckets) + 1), 0.0
+                ]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = {
+                view: (list(counts), total)
+                for view, (counts, total) in sorted(self._series.items())
+            }
+        for view, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{self.name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {cumulative}')
+        return lines
+
+
+request_duration = Histogram(
+    'foodgram_request_duration_seconds',
+    'Total request time.',
+    DURATION_BUCKETS,
+)
+sql_duration = Histogram(
+    'foodgram_sql_duration_seconds',
+    'Time spent in SQL queries per request.',
+    DURATION_BUCKETS,
+)
+sql_queries = Histogram(
+    'foodgram_sql_queries',
+    'SQL queries per request.',
+    COUNT_BUCKETS,
+)
+serializer_duration = Histogram(
+    'foodgram_serializer_duration_seconds',
+    'Time spent in serializers per request.',
+    DURATION_BUCKETS,
+)
+
+
+def observe(view, metrics, total):
+    request_duration.observe(view, total)
+    sql_duration.observe(view, metrics.sql_time)
+    sql_queries.observe(view, metrics.sql_count)
+    serializer_duration.observe(view, metrics.serializer_time)
+
+
+def render_metrics():
+    '''
+    Метрики процесса в текстовом формате Prometheus.
+    '''
+    lines = []
+    for histogram in (
+        request_duration, sql_duration, sql_queries, serializer_duration
+    ):
+        lines.extend(histogram.render())
+    for name in ('hits', 'misses'):
+        metric = f'foodgram_response_cache_{name}_total'
+        lines.extend((
+            f'# TYPE {metric} counter',
+            f'{metric} {getattr(response_cache_stats, name)}',
+        ))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,92 @@
+import random
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+from .querydetector import detect_queries
+
+
+class RequestMetricsMiddleware:
+    '''
+    Для доли запросов REQUEST_METRICS_SAMPLE_RATE считает число и время
+    SQL-запросов, время сериализации и общее время. Отдаёт их
+    в заголовке Server-Timing и копит гистограммы для /api/metrics/.
+
+    При нулевой доле middleware отключается целиком.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        metrics.install_execute_wrapper(metrics.record_query)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.process(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.process(request, response, request_metrics)
+
+    def process(self, request, response, request_metrics):
+        total = perf_counter() - request_metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, request_metrics, total)
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        return response
+
+
+class QueryDetectorMiddleware:
+    '''
+    Включает детектор медленных запросов и N+1 для каждого запроса,
+    если QUERY_DETECTOR не равен off.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.QUERY_DETECTOR == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with detect_queries(method=request.method, path=request.path):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with detect_queries(method=request.method, path=request.path):
+            return await self.get_response(request)
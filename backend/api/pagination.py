@@ -0,0 +1,68 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class RecipePagination(LimitOffsetPagination):
+    '''
+    Пагинация рецептов.
+
+    По умолчанию limit/offset, как и раньше. С ?pagination=cursor
+    используется курсор по убыванию id: стоимость страницы не зависит
+    от глубины. Курсор задаёт свой порядок, поэтому не сочетается
+    с поиском и сортировкой. С ?count=false общее число записей
+    не считается.
+    '''
+    cursor_pagination_class = RecipeCursorPagination
+    cursor_incompatible_params = ('search', 'ordering')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if request.query_params.get('pagination') == 'cursor':
+            params = [
+                param for param in self.cursor_incompatible_params
+                if request.query_params.get(param)
+            ]
+            if params:
+                raise ValidationError({'pagination': (
+                    f'Курсорная пагинация не сочетается с {", ".join(params)}.'
+                )})
+            self.cursor = self.cursor_pagination_class()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        if request.query_params.get('count', '').lower() not in (
+            'false', '0'
+        ):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count = None
+        self.display_page_controls = False
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
@@ -0,0 +1,139 @@
+import contextvars
+import json
+import re
+import threading
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+
+from loguru import logger
+
+from . import metrics
+from .metrics import install_execute_wrapper
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+_current = contextvars.ContextVar('query_detector', default=None)
+
+# Модули с обёртками execute: их кадры есть в стеке каждого запроса.
+_WRAPPER_FILES = frozenset((__file__, metrics.__file__))
+
+
+class NPlusOneError(Exception):
+    '''
+    Повторяющиеся запросы в строгом режиме детектора.
+    '''
+
+
+def query_shape(sql):
+    # Списки IN (%s, %s, ...) разной длины считаем одной формой.
+    return _IN_LIST.sub('(%s...)', sql)
+
+
+def call_site():
+    '''
+    Ближайший к запросу кадр стека из кода проекта.
+    '''
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if (
+            frame.filename.startswith(base_dir)
+            and 'site-packages' not in frame.filename
+            and frame.filename not in _WRAPPER_FILES
+        ):
+            return {
+                'file': frame.filename[len(base_dir) + 1:],
+                'line': frame.lineno,
+                'function': frame.name,
+                'code': frame.line,
+            }
+    return None
+
+
+class QueryDetector:
+    '''
+    Собирает медленные запросы и повторяющиеся формы запросов
+    в пределах одного запроса к API.
+    '''
+
+    def __init__(self):
+        self.slow_ms = settings.QUERY_DETECTOR_SLOW_MS
+        self.repeat_threshold = settings.QUERY_DETECTOR_REPEAT_THRESHOLD
+        self.shapes = Counter()
+        self.sites = {}
+        self.findings = []
+        self._lock = threading.Lock()
+
+    def record(self, sql, duration):
+        shape = query_shape(sql)
+        with self._lock:
+            self.shapes[shape] += 1
+            count = self.shapes[shape]
+        if count == self.repeat_threshold:
+            self.sites[shape] = call_site()
+        duration_ms = duration * 1000
+        if duration_ms >= self.slow_ms:
+            self.findings.append({
+                'type': 'slow_query',
+                'sql': shape,
+                'duration_ms': round(duration_ms, 1),
+                'call_site': call_site(),
+            })
+
+    def repeated(self):
+        return [
+            {
+                'type': 'n_plus_one',
+                'sql': shape,
+                'count': count,
+                'call_site': self.sites.get(shape),
+            }
+            for shape, count in self.shapes.items()
+            if count >= self.repeat_threshold and not any(
+                ignored in shape
+                for ignored in settings.QUERY_DETECTOR_IGNORE
+            )
+        ]
+
+    def report(self, **context):
+        '''
+        Пишет находки в лог JSON-строками и возвращает N+1.
+        '''
+        repeated = self.repeated()
+        for finding in self.findings + repeated:
+            logger.warning(
+                json.dumps(dict(finding, **context), ensure_ascii=False)
+            )
+        return repeated
+
+
+def detect_query(execute, sql, params, many, context):
+    detector = _current.get()
+    if detector is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        detector.record(sql, perf_counter() - started)
+
+
+@contextmanager
+def detect_queries(**context):
+    '''
+    Проверяет запросы к БД внутри блока. В строгом режиме найденный
+    N+1 поднимает NPlusOneError, так что тесты с ним падают.
+    '''
+    install_execute_wrapper(detect_query)
+    detector = QueryDetector()
+    token = _current.set(detector)
+    try:
+        yield detector
+    finally:
+        _current.reset(token)
+    repeated = detector.report(**context)
+    if repeated and settings.QUERY_DETECTOR == 'strict':
+        raise NPlusOneError(json.dumps(repeated, ensure_ascii=False))
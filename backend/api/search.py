@@ -0,0 +1,75 @@
+import threading
+from bisect import bisect_left
+
+from recipes import versions
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    '''
+    Индекс названий ингредиентов в памяти воркера.
+
+    Сначала возвращает совпадения по началу названия, затем по подстроке.
+    Перестраивается при смене версии каталога ингредиентов.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._items = []
+        self._keys = []
+        self._entries = []
+
+    def _refresh(self):
+        version = versions.get_version(versions.INGREDIENTS)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            items = [
+                {'id': pk, 'name': name, 'measurement_unit': unit}
+                for pk, name, unit in Ingredient.objects.order_by(
+                    'id'
+                ).values_list('id', 'name', 'measurement_unit')
+            ]
+            entries = sorted(
+                (item['name'].casefold(), item['id'], item)
+                for item in items
+            )
+            self._items = items
+            self._entries = entries
+            self._keys = [entry[0] for entry in entries]
+            self._version = version
+
+    def all(self):
+        self._refresh()
+        return self._items
+
+    def search(self, query, limit):
+        self._refresh()
+        query = query.casefold()
+        entries, keys = self._entries, self._keys
+        result = []
+        start = bisect_left(keys, query)
+        end = start
+        while (
+            end < len(keys)
+            and keys[end].startswith(query)
+            and len(result) < limit
+        ):
+            result.append(entries[end][2])
+            end += 1
+        if len(result) >= limit:
+            return result
+        for index, (key, _, item) in enumerate(entries):
+            if start <= index < end:
+                continue
+            if query in key:
+                result.append(item)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -1,23 +1,27 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.db import transaction
 
-from loguru import logger
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Subscription, Tag)
+from jobs.models import Job
+from recipes.membership import get_membership
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 from rest_framework import serializers
 
+from .metrics import TimedSerializerMixin
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
@@ -36,21 +40,58 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'too_large': 'Изображение больше {max_size} байт.',
+        'invalid_base64': 'Некорректные данные base64.',
+    }
+    chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, separator, imgstr = data.partition(';base64,')
+            if not separator:
+                self.fail('invalid_base64')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = File(self.decode(imgstr), name='temp.' + ext)
 
         return super().to_internal_value(data)
 
+    def decode(self, imgstr):
+        '''
+        Декодирует base64 частями во временный файл, ограничивая размер.
+
+        Переводы строк и пробелы (base64 из MIME) убираются заранее:
+        validate=True их не пропускает, а части должны быть кратны 4.
+        '''
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        imgstr = ''.join(imgstr.split())
+        # Длина закодированных данных известна до декодирования.
+        if len(imgstr) > (max_size + 2) // 3 * 4:
+            self.fail('too_large', max_size=max_size)
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for start in range(0, len(imgstr), self.chunk_size):
+                file.write(base64.b64decode(
+                    imgstr[start:start + self.chunk_size], validate=True
+                ))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        if file.tell() > max_size:
+            file.close()
+            self.fail('too_large', max_size=max_size)
+        file.seek(0)
+        return file
+
     def to_representation(self, obj):
         if obj:
             return settings.MEDIA_URL + str(obj)
         return None
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(
@@ -58,6 +99,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True
     )
     image = Base64ImageField()
+    image_thumbnail = Base64ImageField(read_only=True)
+    image_thumbnail_webp = Base64ImageField(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -72,129 +115,193 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_thumbnail',
+            'image_thumbnail_webp',
             'text',
             'cooking_time',
         )
 
+    @staticmethod
+    def apply_user_flags(data, membership):
+        '''
+        Проставляет в готовый фрагмент флаги текущего пользователя.
+        '''
+        data['is_favorited'] = membership.is_favorited(data['id'])
+        data['is_in_shopping_cart'] = membership.is_in_shopping_cart(
+            data['id']
+        )
+        data['author'] = dict(
+            data['author'],
+            is_subscribed=membership.is_subscribed(data['author']['id']),
+        )
+        return data
+
     def get_author(self, obj):
         author = obj.author
-        user = self.context['request'].user
-        is_subscribed = False
-        if user.is_authenticated:
-            is_subscribed = Subscription.objects.filter(
-                user=user, author=author
-            ).exists()
+        membership = get_membership(self.context['request'])
         return {
             'email': author.email,
             'id': author.id,
             'username': author.username,
             'first_name': author.first_name,
             'last_name': author.last_name,
-            'is_subscribed': is_subscribed,
+            'is_subscribed': membership.is_subscribed(author.id),
         }
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        is_favorited = False
-        if user.is_authenticated:
-            is_favorited = FavoriteRecipe.objects.filter(user=user,
-                                                         recipe=obj).exists()
-        return is_favorited
+        membership = get_membership(self.context['request'])
+        return membership.is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        result = False
-        if user.is_authenticated:
-            result = ShoppingList.objects.filter(user=user,
-                                                 recipe=obj).exists()
-        return result
+        membership = get_membership(self.context['request'])
+        return membership.is_in_shopping_cart(obj.id)
 
     def to_internal_value(self, data):
         ret = super().to_internal_value(data)
-        ingredients_data = data.get('ingredients', [])
-        recipeingredients = []
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.get('id')
-            amount = ingredient_data.get('amount')
-            recipeingredient_data = {'amount': amount, 'id': ingredient_id}
-            recipeingredients.append(recipeingredient_data)
-
-        ret['recipeingredients'] = recipeingredients
+        if 'recipeingredients' in ret:
+            ret['recipeingredients'] = [
+                {'id': ingredient_data.get('id'), 'amount': item['amount']}
+                for ingredient_data, item in zip(
+                    data.get('ingredients', []), ret['recipeingredients']
+                )
+            ]
         return ret
 
-    def create_tags(self, tags_data):
-        tags = []
-        for tag_data in tags_data:
-            tag, created = Tag.objects.get_or_create(id=tag_data)
-            tags.append(tag)
-        return tags
+    def validate(self, attrs):
+        ingredients_data = attrs.pop('recipeingredients', None)
+        if 'tags' in self.initial_data:
+            attrs['tags'] = self.get_tags(self.initial_data['tags'])
+        elif not self.partial:
+            raise serializers.ValidationError(
+                {'tags': 'Обязательное поле.'}
+            )
+        if ingredients_data is not None:
+            attrs['amounts'] = self.get_ingredient_amounts(ingredients_data)
+        return attrs
 
     @transaction.atomic
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('recipeingredients')
-        tags_data = self.initial_data.get('tags', [])
+        tags = validated_data.pop('tags')
+        amounts = validated_data.pop('amounts')
         user = self.context['request'].user
         recipe = Recipe.objects.create(author=user, **validated_data)
-        recipe_ingredients = [
+        RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
-                recipe=recipe,
-                ingredient_id=ingredient_data['id'],
-                amount=ingredient_data['amount']
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
-            for ingredient_data in ingredients_data
-        ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
-        tags = self.create_tags(tags_data)
-        recipe.tags.set(tags)
+            for ingredient_id, amount in amounts.items()
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        )
 
         return recipe
 
-    def update(self, instance, validated_data):
-        logger.info('Patch')
-        if 'name' in validated_data:
-            instance.name = validated_data['name']
-        if 'image' in validated_data:
-            instance.image = validated_data['image']
-        if 'text' in validated_data:
-            instance.text = validated_data['text']
-        if 'cooking_time' in validated_data:
-            instance.cooking_time = validated_data['cooking_time']
-        instance.save()
-
-        tags_data = self.initial_data.get('tags', [])
-        tags = self.create_tags(tags_data)
-        instance.tags.set(tags)
-
-        ingredients_data = validated_data.get('recipeingredients', [])
+    def get_tags(self, tags_data):
+        if not isinstance(tags_data, list):
+            raise serializers.ValidationError(
+                {'tags': 'Ожидается список id тегов.'}
+            )
+        tag_ids = set()
+        for tag_id in tags_data:
+            try:
+                tag_id = int(tag_id)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(
+                    {'tags': 'Некорректный id тега.'}
+                )
+            if tag_id in tag_ids:
+                raise serializers.ValidationError(
+                    {'tags': f'Тег {tag_id} повторяется.'}
+                )
+            tag_ids.add(tag_id)
+        tags = Tag.objects.in_bulk(tag_ids)
+        missing = tag_ids - set(tags)
+        if missing:
+            raise serializers.ValidationError(
+                {'tags': f'Теги не найдены: {sorted(missing)}'}
+            )
+        return list(tags.values())
 
-        existing_ingredients = instance.ingredients.all()
+    def get_ingredient_amounts(self, ingredients_data):
+        amounts = {}
+        for ingredient_data in ingredients_data:
+            try:
+                ingredient_id = int(ingredient_data['id'])
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError(
+                    {'ingredients': 'Некорректный id ингредиента.'}
+                )
+            if ingredient_id in amounts:
+                raise serializers.ValidationError(
+                    {'ingredients': f'Ингредиент {ingredient_id} повторяется.'}
+                )
+            amounts[ingredient_id] = ingredient_data['amount']
+        found = Ingredient.objects.filter(id__in=amounts).values_list(
+            'id', flat=True
+        )
+        missing = set(amounts) - set(found)
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients': f'Ингредиенты не найдены: {sorted(missing)}'}
+            )
+        return amounts
 
-        for existing_ingredient in existing_ingredients:
-            instance.ingredients.remove(existing_ingredient)
-        instance.save()
+    def update_ingredients(self, instance, amounts):
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in instance.recipeingredients.all()
+        }
+        to_create = []
+        to_update = []
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = existing.pop(ingredient_id, None)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredient(
+                    recipe=instance, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in existing.values()]
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
 
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.get('id')
-            amount = ingredient_data.get('amount')
-            if ingredient_id and amount is not None:
-                try:
-                    ingredient = Ingredient.objects.get(id=ingredient_id)
-                    RecipeIngredient.objects.create(
-                        recipe=instance, ingredient=ingredient, amount=amount
-                    )
-                except RecipeIngredient.DoesNotExist:
-                    pass
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags', None)
+        amounts = validated_data.pop('amounts', None)
+        for field in ('name', 'image', 'text', 'cooking_time'):
+            if field in validated_data:
+                setattr(instance, field, validated_data[field])
         instance.save()
+        if tags is not None:
+            instance.tags.set(tags)
+        if amounts is not None:
+            self.update_ingredients(instance, amounts)
         return instance
 
 
-class AuthorRecipeSerializer(serializers.ModelSerializer):
+class AuthorRecipeSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = (
+            'id',
+            'name',
+            'image',
+            'image_thumbnail',
+            'image_thumbnail_webp',
+            'cooking_time',
+        )
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     recipes = AuthorRecipeSerializer(many=True, read_only=True)
     recipes_count = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
@@ -213,8 +320,17 @@ class AuthorSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.profile.recipes_count
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return Subscription.objects.filter(user=user, author=obj).exists()
+        membership = get_membership(self.context['request'])
+        return membership.is_subscribed(obj.id)
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'result', 'created',
+                  'updated')
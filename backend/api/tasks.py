@@ -0,0 +1,55 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .utility import (shopping_list_csv, shopping_list_pdf, shopping_list_txt,
+                      summarize_ingredients)
+
+EXPORTS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+    'pdf': shopping_list_pdf,
+}
+
+
+@task('api.export_shopping_list')
+def export_shopping_list(user_id, file_format):
+    '''
+    Формирует файл списка покупок в хранилище медиа и возвращает ссылку.
+    '''
+    user = User.objects.get(pk=user_id)
+    data = EXPORTS[file_format](summarize_ingredients(user).iterator())
+    if file_format == 'pdf':
+        content = data.getvalue()
+    else:
+        content = ''.join(data).encode()
+    name = default_storage.save(
+        f'exports/{uuid.uuid4().hex}.{file_format}', ContentFile(content)
+    )
+    remove_expired_exports()
+    return {'url': default_storage.url(name)}
+
+
+def remove_expired_exports():
+    '''
+    Удаляет выгрузки старше JOBS_EXPORT_RETENTION секунд.
+    '''
+    if not default_storage.exists('exports'):
+        return 0
+    expired = timezone.now() - timedelta(
+        seconds=settings.JOBS_EXPORT_RETENTION
+    )
+    removed = 0
+    for name in default_storage.listdir('exports')[1]:
+        path = f'exports/{name}'
+        if default_storage.get_modified_time(path) < expired:
+            default_storage.delete(path)
+            removed += 1
+    return removed
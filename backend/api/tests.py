@@ -0,0 +1,370 @@
+import base64
+import io
+import os
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from recipes import versions
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription, Tag)
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from .querydetector import NPlusOneError, detect_queries
+from .search import ingredient_index
+from .serializers import Base64ImageField
+from .tasks import remove_expired_exports
+
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class RecipeAPITestCase(APITestCase):
+    '''
+    Общий набор данных: авторы, теги, ингредиенты и рецепты,
+    часть из них в избранном, в корзине и в подписках у пользователя.
+    '''
+    recipes_count = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user = User.objects.create_user(
+                'user', 'user@example.com', 'password'
+            )
+            cls.authors = [
+                User.objects.create_user(
+                    f'author{index}', f'author{index}@example.com',
+                    'password', first_name='Имя', last_name='Фамилия',
+                )
+                for index in range(3)
+            ]
+            cls.tags = [
+                Tag.objects.create(
+                    name=f'Тег {index}', color='#ffffff', slug=f'tag{index}'
+                )
+                for index in range(3)
+            ]
+            cls.ingredients = [
+                Ingredient.objects.create(
+                    name=f'ингредиент {index}', measurement_unit='г'
+                )
+                for index in range(10)
+            ]
+            cls.recipes = []
+            for index in range(cls.recipes_count):
+                recipe = Recipe.objects.create(
+                    author=cls.authors[index % len(cls.authors)],
+                    name=f'Рецепт {index}',
+                    image='recipes/images/recipe.png',
+                    text='Описание',
+                    cooking_time=10,
+                )
+                recipe.tags.set(cls.tags[:1 + index % len(cls.tags)])
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=cls.ingredients[
+                            (index + offset) % len(cls.ingredients)
+                        ],
+                        amount=offset + 1,
+                    )
+                    for offset in range(3)
+                )
+                cls.recipes.append(recipe)
+            for recipe in cls.recipes[::2]:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+                ShoppingList.objects.create(user=cls.user, recipe=recipe)
+            for author in cls.authors[:2]:
+                Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+
+@override_settings(QUERY_DETECTOR='strict')
+class QueryDetectorTest(RecipeAPITestCase):
+    '''
+    Горячие эндпоинты не делают повторяющихся запросов на каждую строку.
+    '''
+
+    def test_recipe_list(self):
+        with detect_queries(test='recipe_list'):
+            response = self.client.get(
+                reverse('api:recipe-list'), {'limit': 20}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_recipe_list_filtered(self):
+        with detect_queries(test='recipe_list_filtered'):
+            response = self.client.get(reverse('api:recipe-list'), {
+                'limit': 20,
+                'is_favorited': 1,
+                'tags': [tag.slug for tag in self.tags],
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_detail(self):
+        with detect_queries(test='recipe_detail'):
+            response = self.client.get(
+                reverse('api:recipe-detail', args=(self.recipes[0].pk,))
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        with detect_queries(test='subscriptions'):
+            response = self.client.get(
+                reverse('api:subscriptions-list'), {'recipes_limit': 5}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_detects_n_plus_one(self):
+        with self.assertRaises(NPlusOneError):
+            with detect_queries(test='n_plus_one'):
+                for recipe in Recipe.objects.all():
+                    recipe.author.username
+
+
+class RecipeListQueryCountTest(RecipeAPITestCase):
+    '''
+    Число запросов списка рецептов не зависит от размера страницы.
+    '''
+
+    def test_query_count_is_constant(self):
+        # Холодный кэш: count, id страницы, рецепты с авторами, теги,
+        # ингредиенты и три множества пользователя.
+        for limit in (5, 10, 20):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(8):
+                    response = self.client.get(
+                        reverse('api:recipe-list'), {'limit': limit}
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+                self.assertTrue(all(
+                    recipe['tags'] and len(recipe['ingredients']) == 3
+                    for recipe in response.data['results']
+                ))
+
+    def test_warm_fragments_query_count(self):
+        # Фрагменты рецептов в кэше: остаются count, id страницы
+        # и три множества пользователя (избранное, корзина, подписки).
+        for limit in (5, 10, 20):
+            with self.subTest(limit=limit):
+                self.client.get(reverse('api:recipe-list'), {'limit': limit})
+                with self.assertNumQueries(5):
+                    response = self.client.get(
+                        reverse('api:recipe-list'), {'limit': limit}
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+
+class RecipeTagValidationTest(RecipeAPITestCase):
+    '''
+    Теги рецепта принимаются только списком без повторов.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def post_recipe(self, tags):
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(image, 'PNG')
+        data = {
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 1}],
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': 'data:image/png;base64,'
+            + base64.b64encode(image.getvalue()).decode(),
+        }
+        if tags is not None:
+            data['tags'] = tags
+        return self.client.post(
+            reverse('api:recipe-list'), data, format='json'
+        )
+
+    def test_rejects_duplicate_tags(self):
+        tag_id = self.tags[0].pk
+        response = self.post_recipe([tag_id, tag_id])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_rejects_non_list_tags(self):
+        response = self.post_recipe(str(self.tags[0].pk))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_requires_tags_on_create(self):
+        response = self.post_recipe(None)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_accepts_tag_list(self):
+        response = self.post_recipe([tag.pk for tag in self.tags[:2]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['tags']), 2)
+
+
+class CatalogETagTest(RecipeAPITestCase):
+    '''
+    Условный GET справочников отвечает 304, не обращаясь к БД.
+    '''
+
+    def test_not_modified_without_queries(self):
+        for name in ('api:tag-list', 'api:ingredient-list'):
+            with self.subTest(name=name):
+                etag = self.client.get(reverse(name))['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        reverse(name), HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_catalog(self):
+        etag = self.client.get(reverse('api:tag-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Новый', color='#000000', slug='new')
+        response = self.client.get(
+            reverse('api:tag-list'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class AnonymousResponseCacheTest(RecipeAPITestCase):
+    '''
+    Анонимный список рецептов из кэша отдаётся без запросов к БД.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    def test_hit_without_queries(self):
+        params = {'limit': 6, 'tags': ['tag0']}
+        self.assertEqual(
+            self.client.get(reverse('api:recipe-list'), params)['X-Cache'],
+            'MISS',
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api:recipe-list'), params)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_popularity_ordering_is_not_cached(self):
+        params = {'limit': 6, 'ordering': '-popularity'}
+        self.client.get(reverse('api:recipe-list'), params)
+        response = self.client.get(reverse('api:recipe-list'), params)
+        self.assertNotIn('X-Cache', response)
+
+
+class CatalogVersionTest(RecipeAPITestCase):
+    '''
+    Версии каталогов живут в кэше и не обращаются к БД.
+    '''
+
+    def test_autocomplete_without_queries(self):
+        ingredient_index.search('ингр', 10)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('api:ingredient-list'), {'name': 'ингредиент 1'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'ингредиент 1')
+
+    def test_lost_version_is_never_reused(self):
+        version = versions.get_version(versions.TAGS)
+        self.assertEqual(versions.get_version(versions.TAGS), version)
+        cache.clear()
+        self.assertNotEqual(versions.get_version(versions.TAGS), version)
+        bumped = versions.bump_version(versions.TAGS)
+        self.assertEqual(versions.get_version(versions.TAGS), bumped)
+
+    def test_author_change_refreshes_fragments(self):
+        author = self.authors[0]
+        recipe = self.recipes[0]
+        url = reverse('api:recipe-list')
+        self.client.get(url, {'limit': 30})
+        recipe_version = versions.get_version(versions.recipe(recipe.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            author.first_name = 'Новое имя'
+            author.save()
+        self.assertEqual(
+            versions.get_version(versions.recipe(recipe.pk)), recipe_version
+        )
+        response = self.client.get(url, {'limit': 30})
+        names = {
+            item['author']['first_name']
+            for item in response.data['results']
+            if item['author']['id'] == author.pk
+        }
+        self.assertEqual(names, {'Новое имя'})
+
+
+class ExportRetentionTest(APITestCase):
+    '''
+    Выгрузки старше JOBS_EXPORT_RETENTION удаляются из хранилища.
+    '''
+
+    def test_removes_only_expired(self):
+        with tempfile.TemporaryDirectory() as media, self.settings(
+            MEDIA_ROOT=media, JOBS_EXPORT_RETENTION=60
+        ):
+            old = default_storage.save('exports/old.txt', ContentFile(b'1'))
+            new = default_storage.save('exports/new.txt', ContentFile(b'2'))
+            expired = time.time() - 120
+            os.utime(default_storage.path(old), (expired, expired))
+            self.assertEqual(remove_expired_exports(), 1)
+            self.assertFalse(default_storage.exists(old))
+            self.assertTrue(default_storage.exists(new))
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    '''
+    Картинка в base64: MIME-переносы строк допустимы, размер
+    проверяется до декодирования.
+    '''
+
+    def encode(self, size=8):
+        image = io.BytesIO()
+        Image.new('RGB', (size, size)).save(image, 'PNG')
+        return base64.encodebytes(image.getvalue()).decode()
+
+    def test_accepts_wrapped_base64(self):
+        data = self.encode(64)
+        self.assertIn('\n', data.strip())
+        image = Base64ImageField().to_internal_value(
+            'data:image/png;base64,' + data
+        )
+        self.assertEqual(image.image.size, (64, 64))
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=10)
+    def test_rejects_too_large_before_decoding(self):
+        with self.assertRaisesMessage(ValidationError, 'больше 10 байт'):
+            Base64ImageField().to_internal_value(
+                'data:image/png;base64,' + '!' * 100
+            )
+
+    def test_rejects_malformed(self):
+        for data in ('data:image/png,AAAA', 'data:image/png;base64,A!A='):
+            with self.subTest(data=data):
+                with self.assertRaises(ValidationError):
+                    Base64ImageField().to_internal_value(data)
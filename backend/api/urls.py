@@ -1,11 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from .views import (FavoriteRecipeView, ReadOnlyIngredientViewSet,
-                    ReadOnlyTagViewSet, RecipeViewSet, ShoppingCartPDFView,
-                    ShoppingCartView, SubscribeToAuthorView,
-                    SubscriptionsListView)
+from . import async_views
+from .views import (FavoriteRecipeView, JobStatusView,
+                    ReadOnlyIngredientViewSet, ReadOnlyTagViewSet,
+                    RecipeViewSet, ShoppingCartPDFView, ShoppingCartView,
+                    SubscribeToAuthorView, SubscriptionsListView, metrics_view)
 
 app_name = 'api'
 
@@ -26,5 +28,36 @@ urlpatterns = [
          name='shopping-cart'),
     path('recipes/download_shopping_cart/', ShoppingCartPDFView.as_view(),
          name='shopping-card-pdf'),
+    path('jobs/<int:pk>/', JobStatusView.as_view(), name='job-status'),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Под ASGI горячие GET-запросы обслуживаются асинхронно,
+    # запись и прочие методы остаются за DRF-представлениями.
+    urlpatterns = [
+        path('users/subscriptions/', async_views.async_read(
+            async_views.subscription_list, SubscriptionsListView.as_view()
+        ), name='subscriptions-list'),
+        path('recipes/', async_views.async_read(
+            async_views.recipe_list,
+            RecipeViewSet.as_view({'get': 'list', 'post': 'create'}),
+        ), name='recipe-list'),
+        path('recipes/<int:pk>/', async_views.async_read(
+            async_views.recipe_detail,
+            RecipeViewSet.as_view({
+                'get': 'retrieve',
+                'put': 'update',
+                'patch': 'partial_update',
+                'delete': 'destroy',
+            }),
+        ), name='recipe-detail'),
+        path('ingredients/', async_views.async_read(
+            async_views.ingredient_list,
+            ReadOnlyIngredientViewSet.as_view({'get': 'list'}),
+        ), name='ingredient-list'),
+        path('tags/', async_views.async_read(
+            async_views.tag_list, ReadOnlyTagViewSet.as_view({'get': 'list'})
+        ), name='tag-list'),
+    ] + urlpatterns
@@ -1,12 +1,120 @@
-def summarize_ingredients(recipes):
-    data = {}
-    for recipe in recipes:
-        for ingredient in recipe['ingredients']:
-            if ingredient['name'] not in data:
-                data[ingredient['name']] = {
-                    'amount': ingredient['amount'],
-                    'unit': ingredient['measurement_unit'],
-                }
-            else:
-                data[ingredient['name']]['amount'] += ingredient['amount']
-    return data
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import F, Prefetch, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from recipes.models import Recipe, RecipeIngredient, ShoppingList
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+SHOPPING_LIST_TITLE = 'Вот список ингридиентов к покупке'
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+
+def summarize_ingredients(user):
+    return (
+        RecipeIngredient.objects.filter(
+            recipe__in=ShoppingList.objects.filter(user=user).values('recipe')
+        )
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def annotate_authors(queryset, recipes_limit=None):
+    recipes = Recipe.objects.only(
+        'id', 'name', 'image', 'image_thumbnail', 'image_thumbnail_webp',
+        'cooking_time', 'author_id',
+    ).order_by('-id')
+    if recipes_limit is not None:
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=F('id').desc(),
+            )
+        ).filter(row_number__lte=recipes_limit)
+    return queryset.annotate(
+        recipes_count=Coalesce('profile__recipes_count', 0),
+    ).prefetch_related(Prefetch('recipes', queryset=recipes))
+
+
+def format_ingredient(item):
+    return (
+        f'{item["ingredient__name"].capitalize()} '
+        f'({item["ingredient__measurement_unit"]}) — {item["amount"]}'
+    )
+
+
+def shopping_list_txt(items):
+    yield f'{SHOPPING_LIST_TITLE}\n\n'
+    for item in items:
+        yield f'{format_ingredient(item)}\n'
+
+
+class Echo:
+    '''
+    Псевдо-буфер для csv.writer: возвращает строку вместо записи.
+    '''
+    def write(self, value):
+        return value
+
+
+def shopping_list_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in items:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['amount'],
+        ))
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+        return PDF_FONT_NAME
+    return 'Helvetica'
+
+
+def shopping_list_pdf(items):
+    buffer = BytesIO()
+    font = get_pdf_font()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    line_height = PDF_FONT_SIZE * 1.5
+    pdf.setFont(font, PDF_FONT_SIZE)
+    y = height - PDF_MARGIN
+    pdf.drawString(PDF_MARGIN, y, SHOPPING_LIST_TITLE)
+    y -= line_height * 2
+    for item in items:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, format_ingredient(item))
+        y -= line_height
+    pdf.save()
+    buffer.seek(0)
+    return buffer
@@ -1,31 +1,98 @@
-from io import BytesIO
+import hmac
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.http import FileResponse
+from django.db import transaction
+from django.http import (FileResponse, HttpResponse, HttpResponseForbidden,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes import versions
+from recipes.membership import get_membership
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingList,
                             Subscription, Tag)
 from rest_framework import status, viewsets
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .caching import (AnonymousResponseCacheMixin, CatalogCacheMixin,
+                      recipe_fragments)
 from .filters import MyFilterBackend, RecipeFilter
+from .metrics import render_metrics
+from .pagination import RecipePagination
 from .permissions import IsOwner
+from .search import ingredient_index
 from .serializers import (AuthorRecipeSerializer, AuthorSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          TagSerializer)
-from .utility import summarize_ingredients
+                          IngredientSerializer, JobSerializer,
+                          RecipeSerializer, TagSerializer)
+from .utility import (annotate_authors, get_recipes_limit, shopping_list_csv,
+                      shopping_list_pdf, shopping_list_txt,
+                      summarize_ingredients)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.order_by('-id')
     serializer_class = RecipeSerializer
+    pagination_class = RecipePagination
     filter_backends = (MyFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Список выбирает только id и авторов, а сами рецепты
+            # берёт из фрагментов (render_fragments).
+            return queryset
+        return queryset.with_related()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            'id', 'author_id'
+        )
+        page = self.paginate_queryset(queryset)
+        data = self.get_list_data(queryset if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def get_list_data(self, rows):
+        membership = get_membership(self.request)
+        return [
+            RecipeSerializer.apply_user_flags(fragment, membership)
+            for fragment in recipe_fragments.get_many(
+                rows, self.render_fragments
+            )
+        ]
+
+    def render_fragments(self, recipe_ids):
+        recipes = self.get_queryset().with_related().filter(pk__in=recipe_ids)
+        return self.get_serializer(recipes, many=True).data
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        enqueue('recipes.make_thumbnails', recipe_id=serializer.instance.pk)
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        if 'image' in serializer.validated_data:
+            enqueue(
+                'recipes.make_thumbnails', recipe_id=serializer.instance.pk
+            )
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
     def get_permissions(self):
         if self.request.method == 'GET':
             self.permission_classes = [
@@ -42,7 +109,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return [permission() for permission in self.permission_classes]
 
 
-class ReadOnlyIngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class ReadOnlyIngredientViewSet(CatalogCacheMixin,
+                                viewsets.ReadOnlyModelViewSet):
+    catalog = versions.INGREDIENTS
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     lookup_field = 'id'
@@ -51,15 +120,17 @@ class ReadOnlyIngredientViewSet(viewsets.ReadOnlyModelViewSet):
     ]
     pagination_class = None
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        name = self.request.query_params.get('name', None)
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', None)
         if name:
-            queryset = queryset.filter(name__icontains=name)
-        return queryset
+            return Response(ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        return Response(ingredient_index.all())
 
 
-class ReadOnlyTagViewSet(viewsets.ReadOnlyModelViewSet):
+class ReadOnlyTagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    catalog = versions.TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     lookup_field = 'id'
@@ -74,14 +145,12 @@ class SubscriptionsListView(ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        author_ids = Subscription.objects.filter(user=user).values_list(
-            'author', flat=True
-        )
-        authors = User.objects.filter(pk__in=author_ids)
-        return authors
+        authors = User.objects.filter(subscribers__user=user).order_by('id')
+        return annotate_authors(authors, get_recipes_limit(self.request))
 
 
 class SubscribeToAuthorView(APIView):
+    @transaction.atomic
     def post(self, request, author_id):
         author = get_object_or_404(User, id=author_id)
         user = request.user
@@ -97,6 +166,7 @@ class SubscribeToAuthorView(APIView):
         else:
             return Response('Вы уже подписаны на этого автора', status=400)
 
+    @transaction.atomic
     def delete(self, request, author_id):
         author = get_object_or_404(User, id=author_id)
         user = request.user
@@ -109,12 +179,17 @@ class SubscribeToAuthorView(APIView):
             return Response('Вы уже отписались от этого автора', status=400)
 
     def get_response(self, user, author):
+        author = annotate_authors(
+            User.objects.filter(pk=author.pk),
+            get_recipes_limit(self.request),
+        ).get()
         user_serializer = AuthorSerializer(author,
                                            context={'request': self.request})
         return Response(user_serializer.data)
 
 
 class FavoriteRecipeView(APIView):
+    @transaction.atomic
     def post(self, request, recipe_id):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=recipe_id)
@@ -136,6 +211,7 @@ class FavoriteRecipeView(APIView):
         )
         return recipe_serializer.data
 
+    @transaction.atomic
     def delete(self, request, recipe_id):
         user = request.user
 
@@ -195,31 +271,63 @@ class ShoppingCartView(APIView):
 
 
 class ShoppingCartPDFView(APIView):
-    def get(self, request):
-        user = request.user
-        shopping_list = ShoppingList.objects.filter(user=user).values_list(
-            'recipe', flat=True
-        )
+    formats = {
+        'txt': ('text/plain; charset=utf-8', shopping_list_txt),
+        'csv': ('text/csv; charset=utf-8', shopping_list_csv),
+        'pdf': ('application/pdf', shopping_list_pdf),
+    }
 
-        recipes = Recipe.objects.filter(pk__in=shopping_list)
-        serializer_data = RecipeSerializer(
-            recipes, many=True, context={'request': request}
-        )
-        data = summarize_ingredients(serializer_data.data)
-        buffer = BytesIO()
-        buffer.write('Вот список ингридиентов к покупке'.encode('utf-8'))
-        buffer.write('\n\n'.encode('utf-8'))
-        for item in data.items():
-            buffer.write(
-                f'{item[0].capitalize()} ({item[1]["unit"]}) — '
-                f'{item[1]["amount"]}\n'.encode(
-                    'utf-8'
-                )
-            )
-        buffer.seek(0)
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format здесь выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
 
-        response = FileResponse(buffer, content_type='text/plain')
-        context = 'attachment; filename="shopping_list.txt"'
+    def get(self, request):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in self.formats:
+            return Response(
+                {'detail': 'Unsupported format.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if request.query_params.get('background', '').lower() in (
+            '1', 'true'
+        ):
+            job = enqueue(
+                'api.export_shopping_list', user=request.user,
+                user_id=request.user.pk, file_format=file_format,
+            )
+            return Response(
+                JobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+            )
+        content_type, render = self.formats[file_format]
+        data = render(summarize_ingredients(request.user).iterator())
+        if file_format == 'pdf':
+            response = FileResponse(data, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(data, content_type=content_type)
+        context = f'attachment; filename="shopping_list.{file_format}"'
         response['Content-Disposition'] = context
 
         return response
+
+
+class JobStatusView(RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+
+def metrics_view(request):
+    '''
+    Метрики процесса для Prometheus. Без METRICS_TOKEN недоступны.
+    '''
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -30,12 +30,15 @@ INSTALLED_APPS = [
     'django_filters',
 
     'api',
+    'jobs',
     'recipes',
     'users',
     'drf_yasg',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.QueryDetectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,11 +77,30 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', default=0)),
     }
 }
 
 
+# Первый хэшер — основной; пароли с другим алгоритмом или числом
+# итераций пересчитываются при входе.
+PASSWORD_HASHERS = os.getenv(
+    'PASSWORD_HASHERS',
+    default=','.join((
+        'users.hashers.ConfigurablePBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    )),
+).split(',')
+
+# По умолчанию как в Django 4.2.
+PASSWORD_HASH_ITERATIONS = int(
+    os.getenv('PASSWORD_HASH_ITERATIONS', default=600000)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,15 +129,55 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = STATIC_ROOT = BASE_DIR / 'collected_static'
 
+# Бэкенд и воркер должны видеть один кэш: в нём хранятся версии
+# каталогов и рецептов, которые воркер меняет после миниатюр. В
+# docker-compose для этого общий том cache_foodgram.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='/tmp/foodgram_cache'),
+    }
+}
+
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', default=256))
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', default=0))
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+
+RECIPE_FRAGMENT_TIMEOUT = int(os.getenv('RECIPE_FRAGMENT_TIMEOUT', default=3600))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=5 * 1024 * 1024)
+)
+
+# Base64 раздувает изображение на треть, плюс остальные поля рецепта.
+DATA_UPLOAD_MAX_MEMORY_SIZE = RECIPE_IMAGE_MAX_SIZE * 2
+
+RECIPE_THUMBNAIL_SIZE = int(os.getenv('RECIPE_THUMBNAIL_SIZE', default=480))
+
+# Конфигурация полнотекстового поиска PostgreSQL для рецептов.
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', default='russian')
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -125,4 +187,58 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
-}
\ No newline at end of file
+}
+
+# Кэш аутентификации по токену: LRU процесса, за ним общий кэш.
+# Выход, смена пароля и деактивация сбрасывают токен в общем кэше сразу,
+# а в LRU других процессов — не позже чем через TOKEN_CACHE_LOCAL_TIMEOUT
+# секунд. С TOKEN_CACHE_SHARED=false остаётся только LRU с временем
+# жизни TOKEN_CACHE_TIMEOUT.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=1024))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=30))
+TOKEN_CACHE_LOCAL_TIMEOUT = int(
+    os.getenv('TOKEN_CACHE_LOCAL_TIMEOUT', default=5)
+)
+TOKEN_CACHE_SHARED = os.getenv(
+    'TOKEN_CACHE_SHARED', default='true'
+).lower() == 'true'
+
+# Фоновые задачи: без воркера можно выполнять их сразу после коммита.
+JOBS_ALWAYS_EAGER = os.getenv(
+    'JOBS_ALWAYS_EAGER', default='false'
+).lower() == 'true'
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', default=1))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', default=10))
+# Воркер продлевает выполняемую задачу каждые JOBS_TIMEOUT / 3 секунд;
+# без продления дольше JOBS_TIMEOUT задача считается брошенной.
+JOBS_TIMEOUT = int(os.getenv('JOBS_TIMEOUT', default=600))
+# Сколько секунд хранятся файлы фоновых выгрузок списка покупок.
+JOBS_EXPORT_RETENTION = int(
+    os.getenv('JOBS_EXPORT_RETENTION', default=24 * 60 * 60)
+)
+
+# Асинхронные GET-эндпоинты для запуска под ASGI (uvicorn).
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', default='false'
+).lower() == 'true'
+
+# Доля запросов, для которых собираются метрики (0 — выключено).
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', default=0)
+)
+# /api/metrics/ отвечает только с заголовком Authorization: Bearer <токен>;
+# пока токен не задан, эндпоинт закрыт.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+# Детектор медленных запросов и N+1: off, log или strict (исключение
+# при N+1, для тестов). Находки пишутся в лог JSON-строками.
+QUERY_DETECTOR = os.getenv('QUERY_DETECTOR', default='off').lower()
+QUERY_DETECTOR_SLOW_MS = float(os.getenv('QUERY_DETECTOR_SLOW_MS', default=100))
+QUERY_DETECTOR_REPEAT_THRESHOLD = int(
+    os.getenv('QUERY_DETECTOR_REPEAT_THRESHOLD', default=5)
+)
+# Подстроки SQL известных и принятых повторов.
+QUERY_DETECTOR_IGNORE = [
+    item for item in os.getenv('QUERY_DETECTOR_IGNORE', default='').split('|')
+    if item
+]
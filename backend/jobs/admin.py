@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'user', 'created')
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    readonly_fields = ('created', 'updated')
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import claim, heartbeat, run
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Воркер запущен')
+        while True:
+            job = claim()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+                continue
+            with heartbeat(job):
+                job = run(job)
+            self.stdout.write(f'{job}')
@@ -0,0 +1,136 @@
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from loguru import logger
+
+from .models import Job
+
+registry = {}
+
+
+def task(name):
+    '''
+    Регистрирует функцию как фоновую задачу с указанным именем.
+    '''
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, user=None, **payload):
+    '''
+    Ставит задачу в очередь. Запись видна воркеру после фиксации
+    текущей транзакции.
+    '''
+    job = Job.objects.create(name=name, user=user, payload=payload)
+    if settings.JOBS_ALWAYS_EAGER:
+        transaction.on_commit(lambda: run(start(job)))
+    return job
+
+
+def claim():
+    '''
+    Забирает следующую готовую задачу, не блокируя другие воркеры.
+
+    Задача считается брошенной, если её воркер не продлевал аренду
+    (heartbeat) дольше JOBS_TIMEOUT. Брошенные задачи без оставшихся
+    попыток (например, уронившие воркер) помечаются как проваленные,
+    а не перезапускаются снова.
+    '''
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    Job.objects.filter(
+        status=Job.RUNNING,
+        updated__lt=stale,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED,
+        error='Воркер не продлевал задачу дольше JOBS_TIMEOUT.',
+        updated=now,
+    )
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.PENDING, run_after__lte=now)
+                | Q(
+                    status=Job.RUNNING,
+                    updated__lt=stale,
+                    attempts__lt=F('max_attempts'),
+                )
+            )
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        return start(job)
+
+
+def start(job):
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.save(update_fields=['status', 'attempts', 'updated'])
+    return job
+
+
+@contextmanager
+def heartbeat(job):
+    '''
+    Пока задача выполняется, продлевает её аренду, чтобы claim() не отдал
+    долгую, но живую задачу другому воркеру.
+    '''
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOBS_TIMEOUT / 3):
+                Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+                    updated=timezone.now()
+                )
+        finally:
+            # Соединения потоковые: закрывается только соединение потока.
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield job
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job):
+    '''
+    Выполняет задачу; при ошибке откладывает повтор с нарастающей
+    задержкой, пока не исчерпаны попытки.
+    '''
+    try:
+        func = registry[job.name]
+        result = func(**job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+        logger.exception(f'Job {job} failed')
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.error = ''
+    job.save(update_fields=['status', 'result', 'error', 'run_after',
+                            'updated'])
+    return job
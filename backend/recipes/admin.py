@@ -18,14 +18,11 @@ admin.site.register(User, UserAdmin)
 
 # Настраиваем админ-класс для модели Recipe
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("name", "author")
+    list_display = ("name", "author", "favorites_count")
     list_filter = ("author", "name", "tags")
+    list_select_related = ("author",)
 
-    # Добавляем общее число добавлений этого рецепта в избранное
-    def favorites_count(self, obj):
-        return obj.favoriterecipe_set.count()
-
-    favorites_count.short_description = "Favorites Count"
+    # Общее число добавлений рецепта в избранное хранится в самом рецепте
     readonly_fields = ("favorites_count",)
 
 
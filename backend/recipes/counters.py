@@ -0,0 +1,49 @@
+from django.db.models import F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def increment(queryset, field, delta):
+    '''
+    Атомарно меняет счётчик через F(), не опуская его ниже нуля.
+    '''
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def count_of(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .annotate(total=Func(F('pk'), function='COUNT'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount(user_model, profile_model, recipe_model, favorite_model,
+            subscription_model):
+    '''
+    Пересчитывает все денормализованные счётчики по исходным таблицам.
+    '''
+    profile_model.objects.bulk_create(
+        [
+            profile_model(user_id=pk)
+            for pk in user_model.objects.filter(
+                profile__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    recipe_model.objects.update(favorites_count=count_of(
+        favorite_model.objects.filter(recipe=OuterRef('pk'))
+    ))
+    profile_model.objects.update(
+        recipes_count=count_of(
+            recipe_model.objects.filter(author=OuterRef('user'))
+        ),
+        subscribers_count=count_of(
+            subscription_model.objects.filter(author=OuterRef('user'))
+        ),
+    )
@@ -0,0 +1,35 @@
+from io import BytesIO
+from pathlib import PurePath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_VARIANTS = (
+    ('image_thumbnail', 'JPEG', 'jpg'),
+    ('image_thumbnail_webp', 'WEBP', 'webp'),
+)
+
+
+def make_thumbnails(recipe):
+    '''
+    Создаёт уменьшенные JPEG и WebP копии изображения рецепта.
+    '''
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (settings.RECIPE_THUMBNAIL_SIZE, settings.RECIPE_THUMBNAIL_SIZE)
+        )
+    stem = PurePath(recipe.image.name).stem
+    for field, image_format, extension in THUMBNAIL_VARIANTS:
+        variant = image
+        if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+            variant = variant.convert('RGB')
+        buffer = BytesIO()
+        variant.save(buffer, image_format, quality=85)
+        getattr(recipe, field).save(
+            f'{stem}.{extension}', ContentFile(buffer.getvalue()), save=False
+        )
+    recipe.save(update_fields=[field for field, _, _ in THUMBNAIL_VARIANTS])
@@ -0,0 +1,124 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import versions
+from recipes.models import Ingredient
+
+DEFAULT_PATH = Path(settings.BASE_DIR) / 'recipes' / 'utility' / (
+    'ingredients.json'
+)
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0].strip(), row[1].strip()
+
+
+def read_json(file):
+    '''
+    Построчно разбирает JSON-массив объектов, не загружая файл целиком.
+
+    Ошибки формата сообщаются с номером строки файла.
+    '''
+    decoder = json.JSONDecoder()
+    buffer = ''
+    # Номер строки файла, с которой начинается buffer.
+    line = 1
+    started = finished = False
+
+    def error(position, message):
+        number = line + buffer.count('\n', 0, position)
+        return CommandError(f'Строка {number}: {message}')
+
+    while not finished:
+        chunk = file.read(CHUNK_SIZE)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise error(position, 'ожидается JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                finished = True
+                position += 1
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as decode_error:
+                if chunk:
+                    # Объект мог оборваться на границе блока: дочитываем.
+                    break
+                raise error(decode_error.pos, 'некорректный JSON.')
+            try:
+                name = item['name'].strip()
+                unit = item['measurement_unit'].strip()
+            except (KeyError, TypeError, AttributeError):
+                raise error(
+                    position, 'ожидается объект с name и measurement_unit.'
+                )
+            yield name, unit
+            position = end
+        line += buffer.count('\n', 0, position)
+        buffer = buffer[position:]
+        if not chunk and not finished:
+            raise error(0, 'JSON-массив не закрыт.' if started
+                        else 'ожидается JSON-массив.')
+    while buffer.strip() == '':
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+    raise error(len(buffer) - len(buffer.lstrip()), 'данные после массива.')
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON пачками, без дублей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_PATH))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if path.suffix == '.csv':
+            reader = read_csv
+        elif path.suffix == '.json':
+            reader = read_json
+        else:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+
+        started = time.perf_counter()
+        total = 0
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = reader(file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in islice(rows, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+        versions.bump_version(versions.INGREDIENTS)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {total} строк за {elapsed:.2f} с '
+            f'({total / elapsed if elapsed else total:.0f} строк/с).'
+        ))
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.models import FavoriteRecipe, Recipe, Subscription
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, рецептов и подписчиков.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(User, Profile, Recipe, FavoriteRecipe, Subscription)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,51 @@
+from django.utils.functional import cached_property
+
+from .models import FavoriteRecipe, ShoppingList, Subscription
+
+
+class Membership:
+    '''
+    Избранное, корзина и подписки текущего пользователя.
+
+    Каждое множество загружается одним запросом при первом обращении
+    и живёт до конца запроса, так что флаги проверяются за O(1).
+    '''
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, queryset, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def favorite_ids(self):
+        return self._ids(FavoriteRecipe.objects, 'recipe_id')
+
+    @cached_property
+    def cart_ids(self):
+        return self._ids(ShoppingList.objects, 'recipe_id')
+
+    @cached_property
+    def author_ids(self):
+        return self._ids(Subscription.objects, 'author_id')
+
+    def is_favorited(self, recipe_id):
+        return recipe_id in self.favorite_ids
+
+    def is_in_shopping_cart(self, recipe_id):
+        return recipe_id in self.cart_ids
+
+    def is_subscribed(self, author_id):
+        return author_id in self.author_ids
+
+
+def get_membership(request):
+    membership = getattr(request, 'membership', None)
+    if membership is None:
+        membership = Membership(request.user)
+        request.membership = membership
+    return membership
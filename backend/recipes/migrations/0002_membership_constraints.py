@@ -0,0 +1,100 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    duplicates = (
+        ShoppingList.objects.values('user', 'recipe')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        ShoppingList.objects.filter(
+            user=row['user'], recipe=row['recipe']
+        ).exclude(id=row['keep']).delete()
+
+    Subscription.objects.filter(user=F('author')).delete()
+
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        extra = Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).exclude(id=row['keep'])
+        RecipeIngredient.objects.filter(ingredient__in=extra).update(
+            ingredient=row['keep']
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='favoriterecipe',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='subscription',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['name'],
+                name='ingredient_name_prefix_idx',
+                opclasses=('varchar_pattern_ops',),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', '-id'], name='recipe_author_idx'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_favorite_recipe'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_shopping_list_recipe'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_subscription'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.CheckConstraint(
+                check=models.Q(('user', models.F('author')), _negated=True),
+                name='prevent_self_subscription',
+            ),
+        ),
+    ]
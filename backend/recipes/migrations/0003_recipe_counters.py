@@ -0,0 +1,40 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+from recipes.counters import recount
+
+
+def fill_counters(apps, schema_editor):
+    recount(
+        apps.get_model(settings.AUTH_USER_MODEL),
+        apps.get_model('users', 'Profile'),
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model('recipes', 'FavoriteRecipe'),
+        apps.get_model('recipes', 'Subscription'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_membership_constraints'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx',
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail_webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipes/thumbnails/'),
+        ),
+    ]
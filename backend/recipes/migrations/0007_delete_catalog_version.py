@@ -0,0 +1,16 @@
+# Generated by Django 4.2.4 on 2026-10-18 17:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_catalog_version'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='CatalogVersion',
+        ),
+    ]
@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import IntegerField, Model
+from django.db import connections, models
+from django.db.models import (Exists, F, IntegerField, Model, OuterRef,
+                              Prefetch, Q)
+
+from .search import search_vector
 
 
 class CoolModelBro(Model):
@@ -10,11 +17,62 @@ class CoolModelBro(Model):
     )
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "recipeingredients",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
+        )
+
+    def _is_postgres(self):
+        return connections[self.db].vendor == "postgresql"
+
+    def update_search_vector(self):
+        """
+        Пересчитывает поисковый вектор выбранных рецептов.
+        """
+        if not self._is_postgres():
+            return 0
+        return self.update(search_vector=search_vector(RecipeIngredient))
+
+    def search(self, query):
+        """
+        Полнотекстовый поиск с сортировкой по релевантности.
+
+        Вне PostgreSQL — упрощённый поиск подстроки без ранжирования.
+        """
+        if not self._is_postgres():
+            return self.filter(
+                Q(name__icontains=query)
+                | Q(text__icontains=query)
+                | Exists(RecipeIngredient.objects.filter(
+                    recipe=OuterRef("pk"), ingredient__name__icontains=query
+                ))
+            )
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        return self.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F("search_vector"), search_query)
+        ).order_by("-rank", "-id")
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="recipes")
     name = models.CharField(max_length=255)
     image = models.ImageField(upload_to="recipes/images/")
+    image_thumbnail = models.ImageField(
+        upload_to="recipes/thumbnails/", blank=True, editable=False
+    )
+    image_thumbnail_webp = models.ImageField(
+        upload_to="recipes/thumbnails/", blank=True, editable=False
+    )
     text = models.TextField()
     cooking_time = models.PositiveIntegerField(
         validators=[MaxValueValidator(4320), MinValueValidator(1)]
@@ -22,6 +80,20 @@ class Recipe(models.Model):
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient",
                                          through="RecipeIngredient")
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=("author", "-id"), name="recipe_author_idx"),
+            models.Index(
+                fields=("-favorites_count", "-id"),
+                name="recipe_popularity_idx",
+            ),
+            GinIndex(fields=("search_vector",), name="recipe_search_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -40,6 +112,22 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=100)
     measurement_unit = models.CharField(max_length=50)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient_name_unit",
+            ),
+        ]
+        indexes = [
+            # Поиск по началу названия (LIKE 'abc%') в PostgreSQL.
+            models.Index(
+                fields=("name",),
+                opclasses=("varchar_pattern_ops",),
+                name="ingredient_name_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"
 
@@ -68,7 +156,15 @@ class Subscription(models.Model):
     )
 
     class Meta:
-        unique_together = ("user", "author")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "author"), name="unique_subscription"
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F("author")),
+                name="prevent_self_subscription",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} follows {self.author}"
@@ -79,7 +175,11 @@ class FavoriteRecipe(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
     class Meta:
-        unique_together = ("user", "recipe")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_favorite_recipe"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} favorites {self.recipe}"
@@ -89,5 +189,12 @@ class ShoppingList(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_shopping_list_recipe"
+            ),
+        ]
+
     def __str__(self):
         return f"Shopping list for {self.user}"
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def search_vector(recipe_ingredient_model):
+    '''
+    Поисковый вектор рецепта: название, ингредиенты и описание
+    с убывающим весом. Только для PostgreSQL.
+    '''
+    # Импорт требует psycopg2, поэтому выполняется только при вызове.
+    from django.contrib.postgres.aggregates import StringAgg
+
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        recipe_ingredient_model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value(''), output_field=TextField()),
+            weight='B',
+            config=config,
+        )
+        + SearchVector('text', weight='C', config=config)
+    )
@@ -0,0 +1,163 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from users.models import Profile
+
+from . import versions
+from .counters import increment
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                     Subscription, Tag)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    versions.bump_on_commit(versions.INGREDIENTS, versions.RECIPES)
+
+
+@receiver(pre_save, sender=Ingredient)
+def ingredient_renaming(sender, instance, **kwargs):
+    instance._renamed = instance.pk is not None and Ingredient.objects.filter(
+        pk=instance.pk
+    ).exclude(name=instance.name).exists()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_updated(sender, instance, created, **kwargs):
+    # Рецептов с ингредиентом может быть много, поэтому векторы обновляет
+    # воркер. Без воркера и без JOBS_ALWAYS_EAGER задача ждёт в очереди,
+    # а поиск находит рецепты по прежнему названию.
+    if not created and getattr(instance, '_renamed', False):
+        enqueue('recipes.update_search_vector', ingredient_id=instance.pk)
+
+
+# Поля рецепта, которые входят в поисковый вектор.
+SEARCH_FIELDS = ('name', 'text')
+
+
+def refresh_search_vector(recipe_id):
+    # После коммита, когда ингредиенты рецепта уже записаны.
+    transaction.on_commit(
+        lambda: Recipe.objects.filter(pk=recipe_id).update_search_vector()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+        refresh_search_vector(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    refresh_search_vector(instance.recipe_id)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tags_changed(sender, **kwargs):
+    versions.bump_on_commit(versions.TAGS, versions.RECIPES)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    versions.bump_on_commit(versions.recipe(instance.pk), versions.RECIPES)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    versions.bump_on_commit(
+        versions.recipe(instance.recipe_id), versions.RECIPES
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Изменены рецепты тега: проще сменить версию всех тегов.
+        versions.bump_on_commit(versions.TAGS, versions.RECIPES)
+    else:
+        versions.bump_on_commit(
+            versions.recipe(instance.pk), versions.RECIPES
+        )
+
+
+# Поля автора, которые попадают во фрагменты рецептов.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def author_changing(sender, instance, update_fields=None, **kwargs):
+    # Вход, смена пароля и регистрация не меняют данные автора в рецептах.
+    instance._author_changed = False
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    saved = User.objects.filter(pk=instance.pk).values(*AUTHOR_FIELDS).first()
+    instance._author_changed = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, **kwargs):
+    if not getattr(instance, '_author_changed', False):
+        return
+    versions.bump_on_commit(versions.author(instance.pk), versions.RECIPES)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', 1
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_removed(sender, instance, **kwargs):
+    increment(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_added(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            Profile.objects.filter(user=instance.author_id),
+            'recipes_count',
+            1,
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    increment(
+        Profile.objects.filter(user=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_added(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            Profile.objects.filter(user=instance.author_id),
+            'subscribers_count',
+            1,
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_removed(sender, instance, **kwargs):
+    increment(
+        Profile.objects.filter(user=instance.author_id),
+        'subscribers_count',
+        -1,
+    )
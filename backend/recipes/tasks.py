@@ -0,0 +1,23 @@
+from jobs.queue import task
+
+from .images import make_thumbnails
+from .models import Recipe
+
+
+@task('recipes.make_thumbnails')
+def make_recipe_thumbnails(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        return None
+    make_thumbnails(recipe)
+    return {
+        'image_thumbnail': recipe.image_thumbnail.name,
+        'image_thumbnail_webp': recipe.image_thumbnail_webp.name,
+    }
+
+
+@task('recipes.update_search_vector')
+def update_search_vector(ingredient_id):
+    return Recipe.objects.filter(
+        recipeingredients__ingredient_id=ingredient_id
+    ).update_search_vector()
@@ -0,0 +1,142 @@
+import io
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from jobs.models import Job
+
+from .management.commands.load_ingredients import read_json
+from .models import FavoriteRecipe, Ingredient, Recipe, ShoppingList
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN для PostgreSQL')
+class MembershipIndexPlanTest(TestCase):
+    '''
+    Частые выборки по связям пользователя и рецепта идут по индексам.
+
+    Последовательное сканирование отключено, чтобы на небольшом наборе
+    данных проверять, что подходящий индекс существует и применим.
+    '''
+    users_count = 50
+    recipes_count = 1000
+    ingredients_count = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(username=f'user{index}', email=f'user{index}@example.com')
+            for index in range(cls.users_count)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=users[index % len(users)],
+                name=f'Рецепт {index}',
+                image='recipes/images/recipe.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            for index in range(cls.recipes_count)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(cls.ingredients_count)
+        )
+        for model in (FavoriteRecipe, ShoppingList):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipes[
+                    (user_index * 7 + offset) % len(recipes)
+                ])
+                for user_index, user in enumerate(users)
+                for offset in range(20)
+            )
+        cls.user = users[0]
+        cls.recipe = recipes[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_shopping_list_lookup(self):
+        self.assertUsesIndex(
+            ShoppingList.objects.filter(user=self.user, recipe=self.recipe),
+            'unique_shopping_list_recipe',
+        )
+
+    def test_favorite_lookup(self):
+        self.assertUsesIndex(
+            FavoriteRecipe.objects.filter(user=self.user, recipe=self.recipe),
+            'unique_favorite_recipe',
+        )
+
+    def test_author_recipes(self):
+        self.assertUsesIndex(
+            Recipe.objects.filter(author=self.user).order_by('-id')[:3],
+            'recipe_author_idx',
+        )
+
+    def test_ingredient_prefix_search(self):
+        self.assertUsesIndex(
+            Ingredient.objects.filter(name__startswith='ингредиент 12'),
+            'ingredient_name_prefix_idx',
+        )
+
+
+class IngredientRenameTest(TestCase):
+    '''
+    Поисковые векторы пересчитываются только при смене названия.
+    '''
+
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+
+    def search_jobs(self):
+        return Job.objects.filter(name='recipes.update_search_vector')
+
+    def test_rename_enqueues_refresh(self):
+        self.ingredient.name = 'сахар-песок'
+        self.ingredient.save()
+        self.assertEqual(self.search_jobs().count(), 1)
+
+    def test_other_changes_do_not(self):
+        self.ingredient.measurement_unit = 'кг'
+        self.ingredient.save()
+        self.assertFalse(self.search_jobs().exists())
+
+
+class ReadJsonTest(SimpleTestCase):
+    '''
+    Ошибки в JSON с ингредиентами сообщаются с номером строки.
+    '''
+
+    def read(self, text):
+        return list(read_json(io.StringIO(text)))
+
+    def test_reads_items(self):
+        self.assertEqual(self.read(
+            '[\n{"name": " соль ", "measurement_unit": "г"}\n]\n'
+        ), [('соль', 'г')])
+
+    def test_malformed_items(self):
+        for text in (
+            '[\n{"name": "соль", "measurement_unit": "г"},\n{"name": "м"}]',
+            '[\n{"name": "соль", "measurement_unit": "г"},\n{"name": "са',
+            '[\n{"name": "соль", "measurement_unit": "г"}\n]]',
+        ):
+            with self.subTest(text=text):
+                with self.assertRaisesMessage(CommandError, 'Строка 3:'):
+                    self.read(text)
@@ -0,0 +1,66 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+RECIPES = 'recipes'
+
+
+def _key(name):
+    return f'catalog-version:{name}'
+
+
+def recipe(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def get_versions(names):
+    '''
+    Возвращает версии нескольких каталогов одним обращением к кэшу.
+
+    Пропавшая из кэша версия заменяется новой, ранее не встречавшейся,
+    поэтому записи, построенные на старой версии, больше не читаются.
+    '''
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        version = uuid4().hex
+        # Если версию уже записал другой процесс, берём её.
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+        found[key] = version
+    return {name: found[key] for key, name in keys.items()}
+
+
+def get_version(name):
+    '''
+    Возвращает текущую версию каталога, общую для всех воркеров.
+    '''
+    return get_versions([name])[name]
+
+
+def bump_version(name):
+    '''
+    Присваивает каталогу новую, ранее не встречавшуюся версию.
+    '''
+    version = uuid4().hex
+    cache.set(_key(name), version, timeout=None)
+    return version
+
+
+def bump_on_commit(*names):
+    '''
+    Меняет версии после фиксации транзакции, чтобы кэш не успел
+    сохранить ещё не зафиксированные данные под новой версией.
+    '''
+    def bump():
+        for name in names:
+            bump_version(name)
+
+    transaction.on_commit(bump)
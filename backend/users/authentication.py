@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    '''
+    Кэш «ключ токена → пользователь»: LRU процесса с TTL и, если
+    включён общий кэш, общий кэш Django за ним.
+
+    Запрос сначала смотрит в LRU и обращается к общему кэшу только
+    при промахе. Сброс удаляет ключ из LRU своего процесса и из общего
+    кэша; другие процессы перестают принимать токен не позже чем
+    через local_timeout.
+    '''
+
+    def __init__(self, max_size, timeout, local_timeout, shared):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.local_timeout = local_timeout if shared else timeout
+        self.shared = shared
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared_key(self, key):
+        return f'auth-token:{key}'
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                return user
+            del self._data[key]
+        return None
+
+    def _set_local(self, key, user):
+        if not self.max_size or not self.local_timeout:
+            return
+        with self._lock:
+            self._data[key] = (user, time.monotonic() + self.local_timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get(self, key):
+        user = self._get_local(key)
+        if user is None and self.shared:
+            user = cache.get(self._shared_key(key))
+            if user is not None:
+                self._set_local(key, user)
+        return user
+
+    def set(self, key, user):
+        if not self.timeout:
+            return
+        self._set_local(key, user)
+        if self.shared:
+            cache.set(self._shared_key(key), user, self.timeout)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+        if self.shared and keys:
+            cache.delete_many([self._shared_key(key) for key in keys])
+
+    def invalidate_user(self, user):
+        self.invalidate(*Token.objects.filter(user=user).values_list(
+            'key', flat=True
+        ))
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TIMEOUT,
+    settings.TOKEN_CACHE_LOCAL_TIMEOUT,
+    settings.TOKEN_CACHE_SHARED,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    TokenAuthentication без запроса к БД для недавно виденных токенов.
+    '''
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        # Копия, чтобы представления не меняли объект в кэше.
+        return copy.copy(user), Token(key=key, user=user)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    '''
+    PBKDF2 с числом итераций из настроек.
+
+    Пароли, захэшированные с другим числом итераций, пересчитываются
+    при следующем успешном входе.
+    '''
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Email — логин, поэтому дубликаты не исправляются автоматически:
+    # очищенный email закрыл бы вход в учётную запись.
+    User = apps.get_model('auth', 'User')
+    users = User.objects.exclude(email='').annotate(email_lower=Lower('email'))
+    duplicated = (
+        users.values('email_lower')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values('email_lower')
+    )
+    conflicts = {}
+    for email, pk in users.filter(email_lower__in=duplicated).order_by(
+        'email_lower', 'id'
+    ).values_list('email_lower', 'id'):
+        conflicts.setdefault(email, []).append(pk)
+    if conflicts:
+        raise RuntimeError(
+            'Email без учёта регистра совпадает у нескольких пользователей; '
+            'исправьте email (например, в админке) и повторите migrate:\n'
+            + '\n'.join(
+                f'  {email}: id {ids}' for email, ids in conflicts.items()
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0001_initial'),
+    ]
+
+    # auth_user принадлежит django.contrib.auth, поэтому индекс создаётся
+    # SQL-запросом. Пустые email (например, у суперпользователя) не
+    # участвуют в ограничении уникальности.
+    operations = [
+        migrations.RunPython(
+            check_duplicate_emails, migrations.RunPython.noop
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX user_email_ci_uniq '
+            'ON auth_user (LOWER(email)) WHERE email > \'\'',
+            'DROP INDEX user_email_ci_uniq',
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class Profile(models.Model):
+    '''
+    Денормализованные счётчики пользователя.
+    '''
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name='profile'
+    )
+    recipes_count = models.PositiveIntegerField(default=0)
+    subscribers_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Profile of {self.user}'
@@ -1,10 +1,13 @@
 from django.contrib.auth.models import User
 
-from recipes.models import Subscription
+from api.metrics import TimedSerializerMixin
+from recipes.membership import get_membership
 from rest_framework import serializers
 
+from .utility import users_by_email
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     is_subscribed = serializers.SerializerMethodField()
 
@@ -19,11 +22,19 @@ class UserSerializer(serializers.ModelSerializer):
 
         return user
 
+    def validate_email(self, value):
+        users = users_by_email(value)
+        if self.instance is not None:
+            users = users.exclude(pk=self.instance.pk)
+        if users.exists():
+            raise serializers.ValidationError(
+                'Пользователь с таким email уже существует.'
+            )
+        return value
+
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Subscription.objects.filter(user=user, author=obj).exists()
-        return False
+        membership = get_membership(self.context['request'])
+        return membership.is_subscribed(obj.id)
 
     class Meta:
         model = User
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .authentication import TokenCache
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class TokenCacheTest(TestCase):
+    '''
+    LRU процесса перед общим кэшем; экземпляры TokenCache
+    изображают разные процессы.
+    '''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User(pk=1, username='user')
+        self.tokens = TokenCache(10, 30, 5, shared=True)
+        self.tokens.set('key', self.user)
+
+    def test_lru_hit_skips_shared_cache(self):
+        cache.clear()
+        self.assertEqual(self.tokens.get('key'), self.user)
+
+    def test_other_process_reads_shared_cache(self):
+        other = TokenCache(10, 30, 5, shared=True)
+        self.assertEqual(other.get('key'), self.user)
+        cache.clear()
+        self.assertEqual(other.get('key'), self.user)
+
+    def test_invalidate(self):
+        self.tokens.invalidate('key')
+        self.assertIsNone(self.tokens.get('key'))
+        self.assertIsNone(TokenCache(10, 30, 5, shared=True).get('key'))
@@ -1,3 +1,6 @@
+from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+
 from rest_framework.authtoken.models import Token
 
 
@@ -10,3 +13,14 @@ def get_tokens_for_user(user):
     return {
         'auth_token': str(token.key),
     }
+
+
+def users_by_email(email):
+    '''
+    Пользователи с данным email без учёта регистра (индекс по LOWER).
+    '''
+    # Условие email > '' повторяет условие частичного индекса,
+    # иначе планировщик не сможет его использовать.
+    return User.objects.alias(email_lower=Lower('email')).filter(
+        email_lower=email.lower(), email__gt=''
+    )
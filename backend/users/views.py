@@ -8,8 +8,9 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .authentication import token_cache
 from .serializers import UserSerializer
-from .utility import get_tokens_for_user
+from .utility import get_tokens_for_user, users_by_email
 
 
 @api_view(['POST'])
@@ -35,7 +36,9 @@ def get_token(request):
         return Response('Invalid data', status=status.HTTP_400_BAD_REQUEST)
     email = request.data['email']
     password = request.data['password']
-    user = get_object_or_404(User, email=email)
+    if not isinstance(email, str) or not isinstance(password, str):
+        return Response('Invalid data', status=status.HTTP_400_BAD_REQUEST)
+    user = get_object_or_404(users_by_email(email))
     if not user.check_password(password):
         return Response('Invalid password', status=status.HTTP_400_BAD_REQUEST)
     return Response(get_tokens_for_user(user), status=status.HTTP_201_CREATED)
@@ -80,7 +83,10 @@ class ChangePasswordView(APIView):
             )
 
         user.set_password(new_password)
-        user.save()
+        # request.user может быть копией из кэша токенов: сохраняем только
+        # пароль, чтобы не перезаписать изменения из других процессов.
+        user.save(update_fields=['password'])
+        token_cache.invalidate_user(user)
         return Response(
             status=status.HTTP_204_NO_CONTENT,
         )
@@ -92,5 +98,6 @@ class DeleteTokenView(APIView):
     def post(self, request, format=None):
         user_token = Token.objects.get(user=request.user)
         user_token.delete()
+        token_cache.invalidate(user_token.key)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
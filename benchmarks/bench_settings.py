@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import CACHES as PROJECT_CACHES
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+SECRET_KEY = os.getenv('SECRET_KEY') or 'benchmarks-only'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+# По умолчанию — локальный SQLite; BENCH_DATABASE=postgres берёт
+# параметры подключения из POSTGRES_* и DB_* как основной проект.
+if os.getenv('BENCH_DATABASE', default='sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'BENCH_SQLITE_PATH',
+                default=str(BENCH_DIR / '.data' / 'bench.sqlite3'),
+            ),
+        }
+    }
+
+# Кэш из настроек проекта (CACHE_BACKEND, CACHE_LOCATION) для сценариев,
+# где важна стоимость самого бэкенда; файловый кэш — в каталоге замеров.
+DEPLOYED_CACHES = {'default': dict(PROJECT_CACHES['default'])}
+if DEPLOYED_CACHES['default']['BACKEND'].endswith('FileBasedCache'):
+    DEPLOYED_CACHES['default']['LOCATION'] = str(BENCH_DIR / '.data' / 'cache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+MEDIA_ROOT = str(BENCH_DIR / '.data' / 'media')
+JOBS_ALWAYS_EAGER = False
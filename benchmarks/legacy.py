@@ -0,0 +1,80 @@
+'''
+Прежние реализации эндпоинтов для сравнения в замерах.
+'''
+from io import BytesIO
+
+from django.db import transaction
+from django.http import FileResponse
+
+from api.serializers import RecipeSerializer
+from api.utility import summarize_ingredients
+from api.views import RecipeViewSet
+from recipes.models import Recipe, RecipeIngredient, Tag
+from rest_framework.views import APIView
+
+
+class BytesIOShoppingListView(APIView):
+    '''
+    Выгрузка списка покупок до потоковой отдачи: файл целиком
+    собирается в BytesIO.
+    '''
+
+    def get(self, request):
+        data = summarize_ingredients(request.user)
+        buffer = BytesIO()
+        buffer.write('Вот список ингридиентов к покупке'.encode('utf-8'))
+        buffer.write('\n\n'.encode('utf-8'))
+        for item in data:
+            buffer.write(
+                f'{item["ingredient__name"].capitalize()} '
+                f'({item["ingredient__measurement_unit"]}) — '
+                f'{item["amount"]}\n'.encode(
+                    'utf-8'
+                )
+            )
+        buffer.seek(0)
+
+        response = FileResponse(buffer, content_type='text/plain')
+        context = 'attachment; filename="shopping_list.txt"'
+        response['Content-Disposition'] = context
+
+        return response
+
+
+class LegacyRecipeSerializer(RecipeSerializer):
+    '''
+    Создание рецепта до проверки тегов и ингредиентов в validate():
+    теги через get_or_create по одному, ингредиенты без проверки.
+    '''
+
+    def validate(self, attrs):
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        ingredients_data = validated_data.pop('recipeingredients')
+        tags_data = self.initial_data.get('tags', [])
+        user = self.context['request'].user
+        recipe = Recipe.objects.create(author=user, **validated_data)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_data['id'],
+                amount=ingredient_data['amount'],
+            )
+            for ingredient_data in ingredients_data
+        )
+        tags = []
+        for tag_data in tags_data:
+            tag, _ = Tag.objects.get_or_create(id=tag_data)
+            tags.append(tag)
+        recipe.tags.set(tags)
+        return recipe
+
+
+class LegacyRecipeViewSet(RecipeViewSet):
+    '''
+    Тот же RecipeViewSet, но с прежним сериализатором: остальная часть
+    запроса (перечитывание, задача на миниатюры) совпадает.
+    '''
+    serializer_class = LegacyRecipeSerializer
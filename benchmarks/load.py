@@ -0,0 +1,248 @@
+'''
+Нагрузочное сравнение WSGI и ASGI на настоящих серверах.
+
+Поднимает по очереди gunicorn с синхронными воркерами (foodgram.wsgi)
+и gunicorn с UvicornWorker (foodgram.asgi, ASYNC_READ_VIEWS=true)
+с одинаковым числом воркеров на одних и тех же ядрах. Нагрузку дают
+--concurrency параллельных клиентов с keep-alive на остальных ядрах.
+
+    python benchmarks/load.py --reuse --concurrency 32 --duration 20
+'''
+import argparse
+import http.client
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from run import BENCH_DIR, add_dataset_arguments, percentile, prepare_database
+
+BACKEND_DIR = BENCH_DIR.parent / 'backend'
+
+# Привязка к ядрам есть только в Linux; без неё процессы делят все ядра.
+PIN_CPUS = hasattr(os, 'sched_setaffinity')
+
+SERVERS = {
+    'wsgi': ((
+        'foodgram.wsgi',
+    ), {}),
+    'asgi': ((
+        '--worker-class', 'uvicorn.workers.UvicornWorker',
+        'foodgram.asgi:application',
+    ), {'ASYNC_READ_VIEWS': 'true'}),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    add_dataset_arguments(parser)
+    cpus = sorted(
+        os.sched_getaffinity(0) if PIN_CPUS else range(os.cpu_count())
+    )
+    parser.add_argument('--server-cpus', type=int,
+                        default=max(1, len(cpus) // 2),
+                        help='Ядер под сервер; воркеров столько же')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='Параллельных клиентов')
+    parser.add_argument('--duration', type=float, default=20,
+                        help='Секунд замера на сценарий')
+    parser.add_argument('--warmup', type=float, default=3,
+                        help='Секунд прогрева на сценарий')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--servers', nargs='*', default=list(SERVERS))
+    parser.add_argument('--only', nargs='*', help='Запустить только эти')
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+    args.cpus = cpus
+    return args
+
+
+def pin(cpus):
+    if PIN_CPUS:
+        os.sched_setaffinity(0, cpus)
+
+
+def make_targets():
+    '''
+    Сценарии: имя и функция i -> путь запроса, плюс заголовки клиента.
+    '''
+    from django.contrib.auth.models import User
+
+    from recipes.models import Recipe
+    from rest_framework.authtoken.models import Token
+
+    user = User.objects.order_by('id').first()
+    token, _ = Token.objects.get_or_create(user=user)
+    recipe_ids = list(Recipe.objects.order_by('?').values_list(
+        'id', flat=True
+    )[:100])
+    targets = {
+        'recipe_list': lambda i: '/api/recipes/?' + urlencode(
+            {'limit': 6, 'offset': 6 * (i % 5)}
+        ),
+        'recipe_detail': lambda i: (
+            f'/api/recipes/{recipe_ids[i % len(recipe_ids)]}/'
+        ),
+        'subscriptions': lambda i: (
+            '/api/users/subscriptions/?recipes_limit=3'
+        ),
+    }
+    return targets, {'Authorization': f'Token {token.key}'}
+
+
+def start_server(name, args, cpus):
+    server_args, env = SERVERS[name]
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn',
+            '--workers', str(len(cpus)),
+            '--bind', f'127.0.0.1:{args.port}',
+            '--chdir', str(BACKEND_DIR),
+            '--log-level', 'warning',
+            *server_args,
+        ],
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'bench_settings',
+            'PYTHONPATH': os.pathsep.join((str(BENCH_DIR), str(BACKEND_DIR))),
+            **env,
+        },
+        # Воркеры наследуют привязку к ядрам от мастера.
+        preexec_fn=lambda: pin(cpus),
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f'{name}: сервер не запустился')
+        try:
+            connection = http.client.HTTPConnection(
+                '127.0.0.1', args.port, timeout=5
+            )
+            connection.request('GET', '/api/tags/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit(f'{name}: сервер не ответил за 30 с')
+
+
+def load(args, path_for, headers, seconds):
+    '''
+    Гоняет запросы из --concurrency потоков в течение seconds секунд.
+    '''
+    counter = itertools.count()
+    deadline = time.perf_counter() + seconds
+    durations = []
+    errors = []
+
+    def client():
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', args.port, timeout=30
+        )
+        while time.perf_counter() < deadline:
+            path = path_for(next(counter))
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(repr(error))
+                connection.close()
+                continue
+            if response.status != 200:
+                errors.append(f'{path}: статус {response.status}')
+                continue
+            durations.append(time.perf_counter() - started)
+        connection.close()
+
+    threads = [
+        threading.Thread(target=client) for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return durations, errors, time.perf_counter() - started
+
+
+def measure(args, path_for, headers):
+    load(args, path_for, headers, args.warmup)
+    durations, errors, elapsed = load(args, path_for, headers, args.duration)
+    if len(durations) < 2:
+        sys.exit(f'Нет успешных запросов: {errors[:3]}')
+    return {
+        'requests': len(durations),
+        'errors': len(errors),
+        'throughput_rps': round(len(durations) / elapsed, 1),
+        'mean_ms': round(statistics.mean(durations) * 1000, 2),
+        'p50_ms': round(percentile(durations, 50) * 1000, 2),
+        'p90_ms': round(percentile(durations, 90) * 1000, 2),
+        'p99_ms': round(percentile(durations, 99) * 1000, 2),
+    }
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.db import connections
+
+    prepare_database(args)
+    targets, headers = make_targets()
+    connections.close_all()
+
+    server_cpus = set(args.cpus[:args.server_cpus])
+    client_cpus = set(args.cpus[args.server_cpus:]) or server_cpus
+    if client_cpus == server_cpus:
+        print('Внимание: клиент и сервер делят ядра, задержки завышены.')
+    pin(client_cpus)
+    print(
+        f'Сервер: ядра {sorted(server_cpus)}, воркеров {len(server_cpus)}; '
+        f'клиент: ядра {sorted(client_cpus)}, '
+        f'{args.concurrency} соединений'
+    )
+
+    results = {}
+    for server in args.servers:
+        process = start_server(server, args, server_cpus)
+        try:
+            for name, path_for in targets.items():
+                if args.only and name not in args.only:
+                    continue
+                result = measure(args, path_for, headers)
+                results[f'{name}_{server}'] = result
+                print(
+                    f'{name + "_" + server:<24} '
+                    f'{result["throughput_rps"]:>8} rps  '
+                    f'p50 {result["p50_ms"]:>7} ms  '
+                    f'p99 {result["p99_ms"]:>7} ms  '
+                    f'ошибок {result["errors"]}'
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            'meta': {
+                'server_cpus': len(server_cpus),
+                'client_cpus': len(client_cpus),
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+            },
+            'results': results,
+        }, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,652 @@
+'''
+Замеры пропускной способности и задержек горячих эндпоинтов API.
+
+Запросы выполняются в процессе через тестовый клиент Django, поэтому
+результат отражает стоимость приложения и БД без сети и веб-сервера.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline results.json --threshold 0.2
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCH_DIR), str(BENCH_DIR.parent / 'backend')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench_settings')
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--ingredients', type=int, default=1000,
+                        help='Размер справочника ингредиентов')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--login-users', type=int, default=100000,
+                        help='Пользователей в базе для сценария входа')
+    parser.add_argument('--reuse', action='store_true',
+                        help='Не пересоздавать данные, если база заполнена')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    add_dataset_arguments(parser)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', nargs='*', help='Запустить только эти')
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--baseline', type=Path)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимое ухудшение относительно базы')
+    return parser.parse_args()
+
+
+def prepare_database(args):
+    from django.core.management import call_command
+    from django.db import connection
+
+    from recipes.models import Recipe
+    from seed import seed
+
+    if connection.vendor == 'sqlite':
+        Path(connection.settings_dict['NAME']).parent.mkdir(
+            parents=True, exist_ok=True
+        )
+        if not args.reuse:
+            connection.close()
+            Path(connection.settings_dict['NAME']).unlink(missing_ok=True)
+    call_command('migrate', verbosity=0)
+    if args.reuse and Recipe.objects.exists():
+        return
+    if Recipe.objects.exists():
+        sys.exit('База не пуста: используйте --reuse или чистую базу.')
+    started = time.perf_counter()
+    seed(
+        users=args.users,
+        recipes=args.recipes,
+        ingredients_per_recipe=args.ingredients_per_recipe,
+        favorites_per_user=args.favorites_per_user,
+        ingredients=args.ingredients,
+        random_seed=args.seed,
+    )
+    print(f'Данные созданы за {time.perf_counter() - started:.1f} с')
+
+
+def scenario(setup=None, trace_memory=False, settings=None, requests=None,
+             note=None):
+    '''
+    Параметры сценария: setup(context) выполняется перед прогревом,
+    trace_memory добавляет пиковую память одного отдельного запроса,
+    settings переопределяет настройки Django на время сценария,
+    requests ограничивает число запросов для медленных сценариев,
+    note — пояснение к результату.
+    '''
+    def decorator(run):
+        run.note = note
+        run.setup = setup
+        run.trace_memory = trace_memory
+        run.settings = settings or {}
+        run.requests = requests
+        return run
+    return decorator
+
+
+def token_client(user):
+    from django.test import Client
+
+    from rest_framework.authtoken.models import Token
+
+    token, _ = Token.objects.get_or_create(user=user)
+    return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+
+LOGIN_PASSWORD = 'bench-password'
+
+
+def create_login_users(count):
+    '''
+    Доводит число пользователей сценария входа до count.
+    '''
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    existing = User.objects.filter(username__startswith='login').count()
+    if existing >= count:
+        return
+    started = time.perf_counter()
+    # Один хэш на всех: иначе подготовка займёт часы.
+    password = make_password(LOGIN_PASSWORD)
+    batch_size = 5000
+    for start in range(existing, count, batch_size):
+        User.objects.bulk_create(
+            User(
+                username=f'login{i}',
+                email=f'login{i}@bench.local',
+                password=password,
+            )
+            for i in range(start, min(start + batch_size, count))
+        )
+    print(
+        f'Пользователи для входа созданы за '
+        f'{time.perf_counter() - started:.1f} с'
+    )
+
+
+def cart_user(size):
+    '''
+    Пользователь, у которого в корзине ровно size рецептов.
+    '''
+    from django.contrib.auth.models import User
+
+    from recipes.models import Recipe, ShoppingList
+
+    user, _ = User.objects.get_or_create(
+        username=f'cart{size}', defaults={'email': f'cart{size}@bench.local'}
+    )
+    recipe_ids = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True
+    )[:size])
+    if len(recipe_ids) < size:
+        sys.exit(f'Для корзины из {size} рецептов мало данных: --recipes.')
+    ShoppingList.objects.filter(user=user).delete()
+    ShoppingList.objects.bulk_create(
+        ShoppingList(user=user, recipe_id=recipe_id)
+        for recipe_id in recipe_ids
+    )
+    return user
+
+
+def scenarios():
+    '''
+    Сценарии: имя и функция (client, context, i) -> ответ или None,
+    если сценарий обходится без HTTP.
+    '''
+    def recipe_list(client, ctx, i):
+        return client.get(
+            '/api/recipes/', {'limit': 6, 'offset': 6 * (i % 5)}
+        )
+
+    def recipe_list_filtered(client, ctx, i):
+        return client.get('/api/recipes/', {
+            'limit': 6,
+            'tags': ['tag0', 'tag1'],
+            'is_favorited': 1,
+        })
+
+    def recipe_list_anonymous(client, ctx, i):
+        return ctx['anonymous'].get(
+            '/api/recipes/', {'limit': 6, 'offset': 6 * (i % 5)}
+        )
+
+    @scenario(settings={'RESPONSE_CACHE_TIMEOUT': 0})
+    def recipe_list_anonymous_uncached(client, ctx, i):
+        # Тот же запрос без кэша ответов для анонимных пользователей.
+        return recipe_list_anonymous(client, ctx, i)
+
+    def recipe_detail(client, ctx, i):
+        recipe_id = ctx['recipe_ids'][i % len(ctx['recipe_ids'])]
+        return client.get(f'/api/recipes/{recipe_id}/')
+
+    # Целые слова: полнотекстовый поиск PostgreSQL ищет по словоформам.
+    recipe_search_terms = ('суп', 'борщ', 'салат', 'пирог', 'каша')
+
+    def recipe_search(client, ctx, i):
+        return client.get('/api/recipes/', {
+            'limit': 6,
+            'search': recipe_search_terms[i % len(recipe_search_terms)],
+        })
+
+    def subscriptions(client, ctx, i):
+        return client.get('/api/users/subscriptions/', {'recipes_limit': 3})
+
+    search_terms = ('суп', 'бор', 'са', 'пи', 'ка')
+
+    def ingredient_search(client, ctx, i):
+        return client.get('/api/ingredients/', {
+            'name': search_terms[i % len(search_terms)],
+        })
+
+    def autocomplete_index(client, ctx, i):
+        from django.conf import settings
+
+        from api.search import ingredient_index
+
+        ingredient_index.search(
+            search_terms[i % len(search_terms)],
+            settings.INGREDIENT_SEARCH_LIMIT,
+        )
+
+    def autocomplete_orm(client, ctx, i):
+        # Тот же порядок выдачи, что у индекса: сначала совпадения
+        # по началу названия, затем по подстроке.
+        from django.conf import settings
+
+        from recipes.models import Ingredient
+
+        term = search_terms[i % len(search_terms)]
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        fields = ('id', 'name', 'measurement_unit')
+        found = list(Ingredient.objects.filter(
+            name__istartswith=term
+        ).order_by('name').values(*fields)[:limit])
+        if len(found) < limit:
+            found += Ingredient.objects.filter(name__icontains=term).exclude(
+                name__istartswith=term
+            ).order_by('name').values(*fields)[:limit - len(found)]
+
+    def prepare_token(ctx):
+        from django.conf import settings
+
+        from rest_framework.authtoken.models import Token
+        from users.authentication import TokenCache
+
+        token, _ = Token.objects.get_or_create(user=ctx['user'])
+        ctx['token'] = token
+        # Без LRU: каждое обращение идёт в общий кэш.
+        ctx['shared_tokens'] = TokenCache(
+            0, settings.TOKEN_CACHE_TIMEOUT, 0, shared=True
+        )
+        ctx['shared_tokens'].set(token.key, token.user)
+
+    def token_auth(run):
+        # Сценарии проверки токена идут на кэш из настроек проекта.
+        from django.conf import settings
+
+        return scenario(
+            setup=prepare_token, settings={'CACHES': settings.DEPLOYED_CACHES}
+        )(run)
+
+    @token_auth
+    def token_auth_cached(client, ctx, i):
+        # Попадание в LRU процесса.
+        from users.authentication import CachedTokenAuthentication
+
+        CachedTokenAuthentication().authenticate_credentials(ctx['token'].key)
+
+    @token_auth
+    def token_auth_shared(client, ctx, i):
+        # Промах LRU: чтение и распаковка пользователя из общего кэша.
+        if ctx['shared_tokens'].get(ctx['token'].key) is None:
+            sys.exit('token_auth_shared: токена нет в общем кэше')
+
+    @token_auth
+    def token_auth_db(client, ctx, i):
+        from rest_framework.authentication import TokenAuthentication
+
+        TokenAuthentication().authenticate_credentials(ctx['token'].key)
+
+    def prepare_login(ctx):
+        count = ctx['login_users']
+        create_login_users(count)
+        # Адреса из разных частей таблицы, в разном регистре.
+        step = max(1, count // 100)
+        ctx['login_emails'] = [
+            f'Login{i}@Bench.Local' if i % 2 else f'login{i}@bench.local'
+            for i in range(0, count, step)
+        ]
+
+    @scenario(setup=prepare_login, requests=50)
+    def login(client, ctx, i):
+        # Стоимость входа — в основном хэширование пароля (PBKDF2).
+        return ctx['anonymous'].post('/api/auth/token/login/', {
+            'email': ctx['login_emails'][i % len(ctx['login_emails'])],
+            'password': LOGIN_PASSWORD,
+        })
+
+    def users_me(client, ctx, i):
+        return client.get('/api/users/me/')
+
+    def shopping_list_download(client, ctx, i):
+        return client.get('/api/recipes/download_shopping_cart/')
+
+    def export(size, file_format):
+        # Память и время до первого байта выгрузки в зависимости
+        # от размера корзины.
+        def setup(ctx):
+            ctx[f'cart{size}'] = token_client(cart_user(size))
+
+        @scenario(
+            setup=setup, trace_memory=True,
+            # reportlab выдаёт PDF только целиком: до первого байта
+            # проходит всё время ответа.
+            note='PDF буферизуется целиком' if file_format == 'pdf' else None,
+        )
+        def run(client, ctx, i):
+            return ctx[f'cart{size}'].get(
+                '/api/recipes/download_shopping_cart/',
+                {'format': file_format},
+            )
+        return run
+
+    def export_bytesio(size):
+        # Базовая линия: прежняя выгрузка txt через BytesIO. Вызывается
+        # напрямую, без middleware и маршрутизации (около 0,3 мс).
+        def setup(ctx):
+            from django.test import RequestFactory
+
+            from legacy import BytesIOShoppingListView
+            from rest_framework.authtoken.models import Token
+
+            token, _ = Token.objects.get_or_create(user=cart_user(size))
+            ctx['legacy_export'] = BytesIOShoppingListView.as_view()
+            ctx[f'legacy_request{size}'] = RequestFactory().get(
+                '/api/recipes/download_shopping_cart/',
+                HTTP_AUTHORIZATION=f'Token {token.key}',
+            )
+
+        @scenario(setup=setup, trace_memory=True)
+        def run(client, ctx, i):
+            return ctx['legacy_export'](ctx[f'legacy_request{size}'])
+        return run
+
+    def prepare_recipe_payload(ctx):
+        import base64
+        import io
+
+        from PIL import Image
+        from recipes.models import Ingredient, Tag
+
+        image = io.BytesIO()
+        Image.new('RGB', (200, 200), 'orange').save(image, 'PNG')
+        ctx['recipe_payload'] = {
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in Ingredient.objects.order_by(
+                    'id'
+                ).values_list('id', flat=True)[:8]
+            ],
+            'name': 'Новый рецепт',
+            'text': 'Описание рецепта',
+            'cooking_time': 30,
+            'image': 'data:image/png;base64,'
+            + base64.b64encode(image.getvalue()).decode(),
+        }
+
+    @scenario(setup=prepare_recipe_payload)
+    def recipe_create(client, ctx, i):
+        return client.post(
+            '/api/recipes/', ctx['recipe_payload'],
+            content_type='application/json',
+        )
+
+    def prepare_legacy_create(ctx):
+        import json
+
+        from django.test import RequestFactory
+
+        from legacy import LegacyRecipeViewSet
+        from rest_framework.authtoken.models import Token
+
+        prepare_recipe_payload(ctx)
+        token, _ = Token.objects.get_or_create(user=ctx['user'])
+        factory = RequestFactory()
+        body = json.dumps(ctx['recipe_payload'])
+        view = LegacyRecipeViewSet.as_view({'post': 'create'})
+        ctx['legacy_create'] = lambda: view(factory.post(
+            '/api/recipes/', body, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+        )).render()
+
+    # Базовая линия: прежнее создание рецепта, тоже без middleware.
+    @scenario(setup=prepare_legacy_create)
+    def recipe_create_legacy(client, ctx, i):
+        return ctx['legacy_create']()
+
+    def toggle(path, model_name):
+        # Пары POST/DELETE; setup убирает записи, оставшиеся
+        # от прерванного или нечётного прошлого прогона.
+        def setup(ctx):
+            from django.apps import apps
+
+            apps.get_model('recipes', model_name).objects.filter(
+                user=ctx['user'], recipe_id__in=ctx['toggle_ids']
+            ).delete()
+
+        @scenario(setup=setup)
+        def run(client, ctx, i):
+            recipe_id = ctx['toggle_ids'][i // 2 % len(ctx['toggle_ids'])]
+            url = f'/api/recipes/{recipe_id}/{path}/'
+            if i % 2:
+                return client.delete(url)
+            return client.post(url)
+        return run
+
+    return {
+        'recipe_list': recipe_list,
+        'recipe_list_filtered': recipe_list_filtered,
+        'recipe_list_anonymous': recipe_list_anonymous,
+        'recipe_list_anonymous_uncached': recipe_list_anonymous_uncached,
+        'recipe_search': recipe_search,
+        'recipe_detail': recipe_detail,
+        'subscriptions': subscriptions,
+        'ingredient_search': ingredient_search,
+        'autocomplete_index': autocomplete_index,
+        'autocomplete_orm': autocomplete_orm,
+        'token_auth_cached': token_auth_cached,
+        'token_auth_shared': token_auth_shared,
+        'token_auth_db': token_auth_db,
+        'users_me': users_me,
+        'login': login,
+        'shopping_list_download': shopping_list_download,
+        **{
+            f'export_{file_format}_{size}': export(size, file_format)
+            for file_format in ('txt', 'pdf')
+            for size in (10, 100, 1000)
+        },
+        **{
+            f'export_txt_bytesio_{size}': export_bytesio(size)
+            for size in (10, 100, 1000)
+        },
+        'recipe_create': recipe_create,
+        'recipe_create_legacy': recipe_create_legacy,
+        'favorite_toggle': toggle('favorite', 'FavoriteRecipe'),
+        'shopping_cart_toggle': toggle('shopping_cart', 'ShoppingList'),
+    }
+
+
+def make_context(args):
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+
+    user = User.objects.order_by('id').first()
+    client = token_client(user)
+    recipe_ids = list(Recipe.objects.order_by('?').values_list(
+        'id', flat=True
+    )[:100])
+    # Для переключателей — рецепты вне избранного и корзины, чтобы пары
+    # POST/DELETE всегда возвращали успешный статус.
+    toggle_ids = list(
+        Recipe.objects.exclude(
+            id__in=FavoriteRecipe.objects.filter(user=user).values('recipe')
+        ).exclude(
+            id__in=ShoppingList.objects.filter(user=user).values('recipe')
+        ).order_by('id').values_list('id', flat=True)[:50]
+    )
+    return client, {
+        'user': user,
+        'login_users': args.login_users,
+        'anonymous': Client(),
+        'recipe_ids': recipe_ids,
+        'toggle_ids': toggle_ids,
+    }
+
+
+def percentile(samples, percent):
+    return statistics.quantiles(samples, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def execute(name, run, client, context, i):
+    '''
+    Выполняет один запрос сценария, дочитывая потоковый ответ.
+
+    Возвращает полное время и время до первого байта (для обычного
+    ответа они совпадают).
+    '''
+    started = time.perf_counter()
+    response = run(client, context, i)
+    first_byte = None
+    if response is not None:
+        if response.status_code >= 400:
+            sys.exit(f'{name}: статус {response.status_code}')
+        if response.streaming:
+            for _ in response.streaming_content:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+            response.close()
+    elapsed = time.perf_counter() - started
+    return elapsed, first_byte if first_byte is not None else elapsed
+
+
+def measure(name, run, client, context, args):
+    from django.test import override_settings
+
+    with override_settings(**getattr(run, 'settings', {})):
+        return measure_run(name, run, client, context, args)
+
+
+def measure_run(name, run, client, context, args):
+    if getattr(run, 'setup', None):
+        run.setup(context)
+    for i in range(args.warmup):
+        execute(name, run, client, context, i)
+    requests = args.requests
+    if getattr(run, 'requests', None):
+        requests = min(requests, run.requests)
+    durations = []
+    first_bytes = []
+    started = time.perf_counter()
+    # Номера продолжают прогрев: сценарии с чередованием запросов
+    # не повторяют последний запрос прогрева.
+    for i in range(args.warmup, args.warmup + requests):
+        duration, first_byte = execute(name, run, client, context, i)
+        durations.append(duration)
+        first_bytes.append(first_byte)
+    elapsed = time.perf_counter() - started
+    result = {
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.mean(durations) * 1000, 2),
+        'p50_ms': round(percentile(durations, 50) * 1000, 2),
+        'p90_ms': round(percentile(durations, 90) * 1000, 2),
+        'p99_ms': round(percentile(durations, 99) * 1000, 2),
+    }
+    if first_bytes != durations:
+        result['ttfb_p50_ms'] = round(percentile(first_bytes, 50) * 1000, 2)
+    if getattr(run, 'trace_memory', False):
+        # Отдельный запрос: трассировка памяти искажает время.
+        tracemalloc.start()
+        execute(name, run, client, context, args.warmup + requests)
+        result['peak_memory_kb'] = round(
+            tracemalloc.get_traced_memory()[1] / 1024, 1
+        )
+        tracemalloc.stop()
+    if getattr(run, 'note', None):
+        result['note'] = run.note
+    return result
+
+
+def compare(results, baseline, threshold):
+    '''
+    Возвращает список регрессий относительно базового прогона.
+    '''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ('p50_ms', 'p99_ms', 'ttfb_p50_ms', 'peak_memory_kb'):
+            if key not in result or key not in base:
+                continue
+            if result[key] > base[key] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {key} {base[key]} -> {result[key]}'
+                )
+        if result['throughput_rps'] < base['throughput_rps'] * (
+            1 - threshold
+        ):
+            regressions.append(
+                f'{name}: throughput_rps {base["throughput_rps"]} -> '
+                f'{result["throughput_rps"]}'
+            )
+    return regressions
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.db import connection
+
+    prepare_database(args)
+    client, context = make_context(args)
+
+    results = {}
+    for name, run in scenarios().items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(name, run, client, context, args)
+        result = results[name]
+        line = (
+            f'{name:<28} {result["throughput_rps"]:>8} rps  '
+            f'p50 {result["p50_ms"]:>7} ms  p99 {result["p99_ms"]:>7} ms'
+        )
+        if 'ttfb_p50_ms' in result:
+            line += f'  ttfb {result["ttfb_p50_ms"]:>7} ms'
+        if 'peak_memory_kb' in result:
+            line += f'  peak {result["peak_memory_kb"]:>8} KiB'
+        if 'note' in result:
+            line += f'  ({result["note"]})'
+        print(line)
+
+    report = {
+        'meta': {
+            'dataset': {
+                'users': args.users,
+                'recipes': args.recipes,
+                'ingredients_per_recipe': args.ingredients_per_recipe,
+                'favorites_per_user': args.favorites_per_user,
+                'ingredients': args.ingredients,
+                'login_users': args.login_users,
+                'seed': args.seed,
+            },
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': args.requests,
+        },
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline['meta']['dataset'] != report['meta']['dataset']:
+            print('Внимание: набор данных отличается от базового прогона.')
+        regressions = compare(
+            results, baseline['results'], args.threshold
+        )
+        if regressions:
+            print('Регрессии:')
+            print('\n'.join(f'  {line}' for line in regressions))
+            sys.exit(1)
+        print('Регрессий нет.')
+
+
+if __name__ == '__main__':
+    main()
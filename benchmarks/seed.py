@@ -0,0 +1,132 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription, Tag)
+from users.models import Profile
+
+BATCH_SIZE = 2000
+PASSWORD = 'bench-password'
+WORDS = (
+    'суп', 'борщ', 'салат', 'пирог', 'каша', 'рагу', 'соус', 'омлет',
+    'паста', 'плов', 'котлеты', 'блины', 'запеканка', 'гуляш', 'жаркое',
+)
+
+
+def seed(users, recipes, ingredients_per_recipe, favorites_per_user,
+         ingredients=1000, subscriptions_per_user=10, random_seed=42):
+    '''
+    Заполняет пустую базу синтетическими данными. При одинаковых
+    параметрах и random_seed набор данных одинаков.
+    '''
+    rng = random.Random(random_seed)
+    with transaction.atomic():
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'user{i}',
+                    email=f'user{i}@bench.local',
+                    first_name='Bench',
+                    last_name=f'User{i}',
+                    password=password,
+                )
+                for i in range(users)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(User.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', color=f'#{i:06x}', slug=f'tag{i}')
+            for i in range(6)
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'{rng.choice(WORDS)} ингредиент {i}',
+                    measurement_unit=rng.choice(('г', 'мл', 'шт')),
+                )
+                for i in range(ingredients)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'{rng.choice(WORDS).capitalize()} №{i}',
+                    image='recipes/images/bench.png',
+                    text=' '.join(rng.choices(WORDS, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                )
+                for i in range(recipes)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids,
+                    min(ingredients_per_recipe, len(ingredient_ids)),
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        favorites = min(favorites_per_user, len(recipe_ids))
+        for model in (FavoriteRecipe, ShoppingList):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(recipe_ids, favorites)
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        Subscription.objects.bulk_create(
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in sample_authors(
+                    rng, user_ids, user_id, subscriptions_per_user
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        # bulk_create не вызывает сигналы: счётчики и поисковые векторы
+        # пересчитываются целиком.
+        recount(User, Profile, Recipe, FavoriteRecipe, Subscription)
+        Recipe.objects.all().update_search_vector()
+
+
+def sample_authors(rng, user_ids, user_id, count):
+    authors = rng.sample(user_ids, min(count + 1, len(user_ids)))
+    return [author_id for author_id in authors if author_id != user_id][:count]